@@ -0,0 +1,55 @@
+# This plugin was developed by JFrog
+
+import zipfile
+
+
+class _StreamBuffer:
+    """Write-only, non-seekable sink collecting the zip bytes until they are drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+def zip_stream(files, chunk_size=1024 * 1024):
+    """
+    Generate a zip archive of `files`, a list of (local_file, archive_name), as a stream of byte chunks.
+    The archive is built while it is consumed, so at most about `chunk_size` bytes are kept in memory
+    and no archive file is written to disk.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for local_file, archive_name in files:
+            info = zipfile.ZipInfo.from_file(local_file, archive_name)
+            with open(local_file, "rb") as src, archive.open(info, "w") as dst:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    if buffer.size >= chunk_size:
+                        yield buffer.drain()
+            if buffer.size >= chunk_size:
+                yield buffer.drain()
+    # never yield an empty chunk, it would terminate a chunked request body
+    if buffer.size:
+        yield buffer.drain()
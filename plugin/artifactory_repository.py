@@ -1,44 +1,198 @@
 # This plugin was developed by JFrog
 
+import collections
+import functools
 import os
 import posixpath
 import logging
+import tempfile
+import threading
+import time
+import uuid
 
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse, urljoin
 from mlflow.store.artifact.artifact_repo import ArtifactRepository, verify_artifact_path
 from mlflow.entities import FileInfo
-from mlflow.utils.file_utils import relative_path_to_artifact_path
+from mlflow.exceptions import MlflowException
+from mlflow.utils.file_utils import relative_path_to_artifact_path, create_tmp_dir
+from plugin.json_stream import iter_array
+from plugin.listing_cache import get_listing_cache
+from plugin.metrics import instrument, metrics, start_metrics_server
+from plugin.retry import RetryPolicy, RETRYABLE_EXCEPTIONS
+from plugin.throttle import get_throttle, throttle_settings
+from plugin.transport import get_session
+from plugin.upload_stream import UploadProgress, UploadStream
+try:
+    from mlflow.entities.presigned_download import PresignedDownloadUrlResponse
+    from mlflow.exceptions import _UnsupportedPresignedDownloadException
+    from mlflow.store.artifact.artifact_repo import MultipartDownloadMixin
+except ImportError:  # MLflow versions without presigned downloads
+    MultipartDownloadMixin = None
 _logger = logging.getLogger(__name__)
 
 VERSION = "1.0.1"
-class JFrogArtifactoryRepository(ArtifactRepository):
-    is_plugin = True
 
-    def __init__(self, artifact_uri):
-        super(JFrogArtifactoryRepository, self).__init__(artifact_uri)
-        self.debug_mode = (os.getenv("ARTIFACTORY_DEBUG", "false") == "true")
-        if self.debug_mode:
-            print(f"JFROG: __init__ artifact_uri={artifact_uri}")
-        rt_no_ssl = os.getenv("ARTIFACTORY_NO_SSL", "false")
-        uri, repo = self.extract_uri(artifact_uri, rt_no_ssl)
-        self.rt_url = uri
-        self.repository = repo
-        self.token = os.getenv("ARTIFACTORY_AUTH_TOKEN")
 
+def _get_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _get_umask()
+
+
+def download_tempfile(local_path):
+    """
+    Create the temporary file, next to `local_path`, a download is written to before it is renamed into place.
+    Returns (fd, path). mkstemp creates it readable by its owner only, it gets the permissions of a file opened
+    for writing instead, so downloaded artifacts can be read by other users as before.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(local_path)),
+                                    prefix="." + os.path.basename(local_path), suffix=".tmp")
+    os.chmod(tmp_path, 0o666 & ~_UMASK)
+    return fd, tmp_path
+
+# size of the chunks storage API listings are read and parsed in
+_LISTING_CHUNK_SIZE = 64 * 1024
+
+
+class ArtifactEntry(collections.namedtuple("ArtifactEntry", ["path", "is_dir", "file_size"])):
+    """Compact listing entry of `iter_artifacts`, converted to an MLflow FileInfo on demand."""
+    __slots__ = ()
+
+    def to_file_info(self):
+        return FileInfo(self.path, self.is_dir, self.file_size)
+
+
+def _same_content(checksums, entry):
+    """Whether local (sha1, sha256) checksums match those of a deep listing entry."""
+    sha1, sha256 = checksums
+    if entry.get("sha2"):
+        return entry["sha2"] == sha256
+    return entry.get("sha1") == sha1
+
+
+def _enable_debug_logging():
+    """Log the debug messages of all plugin modules to stderr, as set by ARTIFACTORY_DEBUG."""
+    logger = logging.getLogger(__name__.rpartition(".")[0])
+    logger.setLevel(logging.DEBUG)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s JFrog %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+
+
+class RepositorySettings:
+    """
+    The ARTIFACTORY_* settings of the repositories, read from the environment by `get_settings()`.
+    The retry policy, throttle settings and caches are shared by all repositories of the process.
+    """
+
+    def __init__(self):
+        self.debug_mode = os.getenv("ARTIFACTORY_DEBUG", "false") == "true"
+        self.metrics_port = int(os.getenv("ARTIFACTORY_METRICS_PORT") or 0)
+        self.rt_no_ssl = os.getenv("ARTIFACTORY_NO_SSL", "false")
+        self.token = os.getenv("ARTIFACTORY_AUTH_TOKEN")
+        self.pool_size = int(os.getenv("ARTIFACTORY_POOL_SIZE", "32"))
+        self.signed_urls = os.getenv("ARTIFACTORY_SIGNED_URLS", "false").lower() == "true"
+        self.upload_workers = int(os.getenv("ARTIFACTORY_UPLOAD_WORKERS", "8"))
+        self.upload_chunk_size = int(os.getenv("ARTIFACTORY_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+        self.multipart_threshold = int(os.getenv("ARTIFACTORY_MULTIPART_THRESHOLD", str(1024 * 1024 * 1024)))
+        self.multipart_part_size = int(os.getenv("ARTIFACTORY_MULTIPART_PART_SIZE", str(100 * 1024 * 1024)))
+        self.multipart_workers = int(os.getenv("ARTIFACTORY_MULTIPART_WORKERS", "4"))
+        self.multipart_part_retries = int(os.getenv("ARTIFACTORY_MULTIPART_PART_RETRIES", "3"))
+        self.checksum_deploy = os.getenv("ARTIFACTORY_CHECKSUM_DEPLOY", "false").lower() == "true"
+        self.checksum_deploy_min_size = int(os.getenv("ARTIFACTORY_CHECKSUM_DEPLOY_MIN_SIZE", "10240"))
+        self.checksum_processes = int(os.getenv("ARTIFACTORY_CHECKSUM_PROCESSES", "1"))
+        self.sync_uploads = os.getenv("ARTIFACTORY_SYNC_UPLOADS", "false").lower() == "true"
+        self.sync_index_path = os.getenv("ARTIFACTORY_SYNC_INDEX", os.path.join(
+            os.path.expanduser("~"), ".cache", "mlflow-jfrog-plugin", "hash-index.json"))
+        self.archive_upload = os.getenv("ARTIFACTORY_ARCHIVE_UPLOAD", "false").lower() == "true"
+        self.archive_upload_min_files = int(os.getenv("ARTIFACTORY_ARCHIVE_UPLOAD_MIN_FILES", "100"))
+        self.archive_upload_max_file_size = int(os.getenv("ARTIFACTORY_ARCHIVE_UPLOAD_MAX_FILE_SIZE",
+                                                          str(1024 * 1024)))
+        self.download_workers = int(os.getenv("ARTIFACTORY_DOWNLOAD_WORKERS", "8"))
+        self.download_chunk_size = int(os.getenv("ARTIFACTORY_DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+        self.download_queue_size = int(os.getenv("ARTIFACTORY_DOWNLOAD_QUEUE_SIZE", "1000"))
+        self.download_listing = os.getenv("ARTIFACTORY_DOWNLOAD_LISTING", "deep").lower()
+        self.ranged_download_threshold = int(os.getenv("ARTIFACTORY_RANGED_DOWNLOAD_THRESHOLD",
+                                                       str(512 * 1024 * 1024)))
+        self.ranged_download_part_size = int(os.getenv("ARTIFACTORY_RANGED_DOWNLOAD_PART_SIZE",
+                                                       str(64 * 1024 * 1024)))
+        self.ranged_download_workers = int(os.getenv("ARTIFACTORY_RANGED_DOWNLOAD_WORKERS", "8"))
+        self.async_transport = os.getenv("ARTIFACTORY_ASYNC_TRANSPORT", "false").lower() == "true"
+        self.async_max_concurrency = int(os.getenv("ARTIFACTORY_ASYNC_MAX_CONCURRENCY", "64"))
+        self.delete_workers = int(os.getenv("ARTIFACTORY_DELETE_WORKERS", "8"))
+        self.delete_skip_trash = os.getenv("ARTIFACTORY_DELETE_SKIP_TRASH", "false").lower() == "true"
         self.artifacts_delete_skip = os.getenv("ARTIFACTORY_ARTIFACTS_DELETE_SKIP", "false")
-        if self.artifacts_delete_skip.lower() == "false":
-            print(f"JFrog: Deletions of experiments or runs will result in artifacts deletions on Artifactory")
-        else:
-            print(f"JFrog: Deletions of experiments or runs will not result in artifacts deletions on Artifactory")
-        if self.debug_mode:
-            print("JFrog: uri = {} repo={}".format(self.rt_url, self.repository))
-        if self.token is None:
-            raise Exception(f"No Artifactory Token provided through environment ARTIFACTORY_AUTH_TOKEN`")
+        self.retry = RetryPolicy.from_env()
+        self.throttle_settings = throttle_settings()
+        self.listing_cache = get_listing_cache(float(os.getenv("ARTIFACTORY_LIST_CACHE_TTL", "0")),
+                                               int(os.getenv("ARTIFACTORY_LIST_CACHE_SIZE", "1024")))
+        self.download_cache = None
+
+
+@functools.lru_cache(maxsize=None)
+def get_settings():
+    """
+    Return the RepositorySettings of the process. They are read once, as MLflow creates a repository for every
+    artifacts request of the tracking server, use `clear_settings()` to read them again.
+    """
+    settings = RepositorySettings()
+    if settings.token is None:
+        raise Exception(f"No Artifactory Token provided through environment ARTIFACTORY_AUTH_TOKEN`")
+    if settings.debug_mode:
+        _enable_debug_logging()
+    if os.getenv("ARTIFACTORY_DOWNLOAD_CACHE_DIR"):
+        from plugin.download_cache import DownloadCache
+        settings.download_cache = DownloadCache(
+            os.getenv("ARTIFACTORY_DOWNLOAD_CACHE_DIR"),
+            int(os.getenv("ARTIFACTORY_DOWNLOAD_CACHE_MAX_SIZE", str(10 * 1024 * 1024 * 1024))))
+    if settings.artifacts_delete_skip.lower() == "false":
+        _logger.info("Deletions of experiments or runs will result in artifacts deletions on Artifactory")
+    else:
+        _logger.info("Deletions of experiments or runs will not result in artifacts deletions on Artifactory")
+    return settings
 
 
+def clear_settings():
+    """Read the ARTIFACTORY_* settings again for the repositories created from now on."""
+    get_settings.cache_clear()
+    parse_artifact_uri.cache_clear()
 
 
+class JFrogArtifactoryRepository(ArtifactRepository):
+    is_plugin = True
+
+    def __new__(cls, *args, **kwargs):
+        if (cls is JFrogArtifactoryRepository and MultipartDownloadMixin is not None
+                and get_settings().signed_urls):
+            cls = SignedUrlJFrogArtifactoryRepository
+        return super(JFrogArtifactoryRepository, cls).__new__(cls)
+
+    def __init__(self, artifact_uri, tracking_uri=None, registry_uri=None):
+        # MLflow versions before 3 create repositories with the artifact URI only
+        uris = {name: uri for name, uri in (("tracking_uri", tracking_uri), ("registry_uri", registry_uri))
+                if uri is not None}
+        super(JFrogArtifactoryRepository, self).__init__(artifact_uri, **uris)
+        _logger.debug("__init__ artifact_uri=%s", artifact_uri)
+        self.settings = get_settings()
+        if self.settings.metrics_port:
+            start_metrics_server(self.settings.metrics_port)
+        self.rt_url, self.repository = parse_artifact_uri(artifact_uri, self.settings.rt_no_ssl)
+        # shared by all the repositories of the process
+        self.retry = self.settings.retry
+        self.listing_cache = self.settings.listing_cache
+        self.download_cache = self.settings.download_cache
+        _logger.debug("uri = %s repo=%s", self.rt_url, self.repository)
+        self.checksum_deploy_stats = {"deployed_files": 0, "uploaded_files": 0, "bytes_saved": 0}
+        self._stats_lock = threading.Lock()
+        self._async_repository_instance = None
+        self.session = get_session(self.get_headers(), self.settings.pool_size)
+        self.throttle = get_throttle(self.rt_url, **self.settings.throttle_settings)
+
     @staticmethod
     def extract_uri(uri, rt_no_ssl):
         parsed_url = urlparse(uri)
@@ -56,117 +210,675 @@ class JFrogArtifactoryRepository(ArtifactRepository):
         return artifactory_uri, repo_name
 
 
-    def log_artifact(self, local_file, artifact_path=None):
-        if self.debug_mode:
-            print("JFrog: log_artifact localfile={} , artifact_path={}".format(local_file, artifact_path))
+    @instrument("log_artifact")
+    def log_artifact(self, local_file, artifact_path=None, progress_callback=None):
+        """
+        Upload a file. `progress_callback(dest_path, file_progress, total_progress)` is called as its
+        content is sent, see UploadProgress.
+        """
+        _logger.debug("log_artifact localfile=%s , artifact_path=%s", local_file, artifact_path)
         verify_artifact_path(artifact_path)
         dest_path = os.path.basename(local_file)
         if artifact_path:
             dest_path = posixpath.join(artifact_path, os.path.basename(local_file))
-        if self.debug_mode:
-            print("JFrog: log_artifact dest_path={}".format(dest_path))
+        _logger.debug("log_artifact dest_path=%s", dest_path)
 
-        with open(local_file, "rb") as f:
-            r = requests.put(
-                self.rt_url + "/" + self.repository + "/" + dest_path, data=f, headers=self.get_headers()
-            )
+        progress = None
+        if progress_callback is not None:
+            progress = UploadProgress(progress_callback, os.path.getsize(local_file))
+        try:
+            self._upload_file(local_file, dest_path, progress=progress)
+        finally:
+            self._invalidate_listings(dest_path)
 
-    def log_artifacts(self, local_dir, artifact_path=None):
-        if self.debug_mode:
-            print(f"JFrog: log_artifacts parameters local_dir={local_dir}, artifact_path={artifact_path}")
+    @instrument("log_artifact_from_buffer")
+    def log_artifact_from_buffer(self, buffer, artifact_file, progress_callback=None):
+        """
+        Upload in-memory content (bytes, bytearray, memoryview or io.BytesIO) to `artifact_file`, a path
+        relative to the artifact root, without writing it to a local file first.
+        """
+        _logger.debug("log_artifact_from_buffer artifact_file=%s", artifact_file)
+        verify_artifact_path(artifact_file)
+        if hasattr(buffer, "getbuffer"):
+            buffer = buffer.getbuffer()
+        buffer = memoryview(buffer).cast("B")
+        progress = None
+        if progress_callback is not None:
+            progress = UploadProgress(progress_callback, buffer.nbytes)
+        try:
+            r = self._request("PUT", self._artifact_url(artifact_file),
+                              body=lambda: self._upload_stream(buffer, artifact_file, buffer.nbytes, progress))
+            _logger.debug("log_artifact_from_buffer put status %s reason %s", r.status_code, r.reason)
+            r.raise_for_status()
+        finally:
+            self._invalidate_listings(artifact_file)
+
+    @instrument("log_artifacts")
+    def log_artifacts(self, local_dir, artifact_path=None, progress_callback=None):
+        """
+        Upload the files of a directory. `progress_callback(dest_path, file_progress, total_progress)` is
+        called as the content of each file is sent, see UploadProgress.
+        When ARTIFACTORY_SYNC_UPLOADS is set only new or changed files are uploaded, see sync_artifacts.
+        """
+        if self.settings.sync_uploads:
+            self.sync_artifacts(local_dir, artifact_path, progress_callback=progress_callback)
+            return
+        _logger.debug("log_artifacts parameters local_dir=%s, artifact_path=%s", local_dir, artifact_path)
         verify_artifact_path(artifact_path)
         local_dir = os.path.abspath(local_dir)
         dest_path = ""
         if artifact_path:
             dest_path = artifact_path  # posixpath.join(artifact_path, os.path.basename(local_dir))
-        if self.debug_mode:
-            print(f"JFrog: log_artifacts dest_path={dest_path}")
+        _logger.debug("log_artifacts dest_path=%s", dest_path)
+
+        uploads = self.list_local_files(local_dir, dest_path)
+        try:
+            self._upload_tree(uploads, dest_path, progress_callback)
+        finally:
+            self._invalidate_listings(dest_path)
+
+    @instrument("sync_artifacts")
+    def sync_artifacts(self, local_dir, artifact_path=None, delete=False, progress_callback=None):
+        """
+        Upload only the files of a directory which are new or changed compared to artifact_path, e.g. for
+        checkpoints logged periodically during training. The remote tree is listed once with its checksums,
+        local files of the same size are compared by checksum, which are kept in a local hash index
+        (ARTIFACTORY_SYNC_INDEX) so unchanged files are not hashed again. With `delete`, remote files
+        missing from the directory are deleted.
+        Returns {"uploaded": [...], "unchanged": [...], "deleted": [...]} artifact paths.
+        """
+        _logger.debug("sync_artifacts local_dir=%s, artifact_path=%s, delete=%s", local_dir, artifact_path, delete)
+        verify_artifact_path(artifact_path)
+        dest_path = artifact_path or ""
+        uploads = self.list_local_files(os.path.abspath(local_dir), dest_path)
+        prefix = dest_path.strip("/") + "/" if dest_path.strip("/") else ""
+        remote_files = {prefix + entry["uri"].strip("/"): entry for entry in self._list_deep(dest_path) or []
+                        if not entry["folder"]}
 
+        same_size = [local_file for local_file, file_dest_path in uploads if file_dest_path in remote_files
+                     and int(remote_files[file_dest_path]["size"]) == os.path.getsize(local_file)]
+        from plugin.hash_index import HashIndex
+        index = HashIndex(self.settings.sync_index_path)
+        checksums = index.checksums(same_size, self.settings.checksum_processes)
+        index.save()
+        changed = []
+        unchanged = []
+        for local_file, file_dest_path in uploads:
+            if local_file in checksums and _same_content(checksums[local_file], remote_files[file_dest_path]):
+                unchanged.append(file_dest_path)
+            else:
+                changed.append((local_file, file_dest_path))
+        _logger.debug("sync_artifacts %d changed, %d unchanged files", len(changed), len(unchanged))
+
+        local_paths = {file_dest_path for _, file_dest_path in uploads}
+        extras = []
+        if delete and self.settings.artifacts_delete_skip != "true":
+            extras = sorted(path for path in remote_files if path not in local_paths)
+        try:
+            self._upload_tree(changed, dest_path, progress_callback, checksums)
+            if extras:
+                failures = {path: error for path, error in self.delete_artifacts_bulk(extras).items() if error}
+                if failures:
+                    details = "\n".join(f"{path}: {error}" for path, error in sorted(failures.items()))
+                    raise Exception(f"Failed deleting {len(failures)} of {len(extras)} artifacts "
+                                    f"from {self.rt_url}/{self.repository}:\n{details}")
+        finally:
+            self._invalidate_listings(dest_path)
+        return {"uploaded": [file_dest_path for _, file_dest_path in changed], "unchanged": unchanged,
+                "deleted": extras}
+
+    def _upload_tree(self, uploads, dest_path, progress_callback=None, checksums=None):
+        """Upload the (local_file, dest_path) files of a directory logged to dest_path."""
+        progress = None
+        if progress_callback is not None:
+            progress = UploadProgress(progress_callback,
+                                      sum(os.path.getsize(local_file) for local_file, _ in uploads))
+        if self.settings.archive_upload:
+            uploads = self._upload_archive(uploads, dest_path, progress)
+        checksums = dict(checksums or {})
+        if self.settings.checksum_deploy:
+            from plugin.checksums import compute_checksums
+            checksums.update(compute_checksums([local_file for local_file, _ in uploads
+                                                if self._use_checksum_deploy(local_file)
+                                                and local_file not in checksums], self.settings.checksum_processes))
+        self._upload_files(uploads, checksums, progress)
+        if self.settings.checksum_deploy:
+            _logger.debug("log_artifacts checksum deploy stats %s", self.checksum_deploy_stats)
+
+    @staticmethod
+    def list_local_files(local_dir, dest_path):
+        """Return the (local_file, dest_path) uploads of all files under local_dir."""
+        uploads = []
         for root, _, filenames in os.walk(local_dir):
             upload_path = dest_path
             if root != local_dir:
                 rel_path = os.path.relpath(root, local_dir)
                 rel_path = relative_path_to_artifact_path(rel_path)
-                upload_path = dest_path + "/" + rel_path
+                upload_path = dest_path + "/" + rel_path if dest_path else rel_path
 
-            headers = self.get_headers()
             for f in filenames:
-                with open(os.path.join(root, f), "rb") as file:
-                    if self.debug_mode:
-                        print(f"JFrog: log_artifacts log_artifacts.file {file} put into path {upload_path}")
-                    if upload_path:
-                        url = self.rt_url + "/" + self.repository + "/" + upload_path + "/" + f
-                    else:
-                        url = self.rt_url + "/" + self.repository + "/" + f
-                    r = requests.put(url, data=file, headers=headers)
-                    if self.debug_mode:
-                        print(f"JFrog: log_artifacts put status {r.status_code} reason { r.reason}")
+                file_dest_path = upload_path + "/" + f if upload_path else f
+                uploads.append((os.path.join(root, f), file_dest_path))
+        return uploads
+
+    def _upload_archive(self, uploads, dest_path, progress=None):
+        """
+        Upload the files smaller than ARTIFACTORY_ARCHIVE_UPLOAD_MAX_FILE_SIZE in a single request, as a zip
+        archive streamed while it is built and exploded by Artifactory into dest_path.
+        Returns the uploads left to be uploaded file by file, all of them when the archive was rejected.
+        """
+        small_files = [(local_file, file_dest_path) for local_file, file_dest_path in uploads
+                       if os.path.getsize(local_file) < self.settings.archive_upload_max_file_size]
+        if len(small_files) < self.settings.archive_upload_min_files:
+            return uploads
+        prefix = dest_path + "/" if dest_path else ""
+        files = [(local_file, file_dest_path[len(prefix):]) for local_file, file_dest_path in small_files]
+        archive_path = prefix + f".mlflow-artifacts-{uuid.uuid4().hex}.zip"
+        _logger.debug("log_artifacts uploading %d files as archive %s", len(files), archive_path)
+        from plugin.archive import zip_stream
+        try:
+            r = self._request("PUT", self._artifact_url(archive_path), body=lambda: zip_stream(files),
+                              headers={"X-Explode-Archive": "true", "X-Explode-Archive-Atomic": "true"})
+            r.raise_for_status()
+        except Exception as e:
+            _logger.debug("archive upload rejected, uploading files one by one %s", e)
+            return uploads
+        if progress is not None:
+            for local_file, file_dest_path in small_files:
+                progress.complete_file(file_dest_path, os.path.getsize(local_file))
+        archived = set(small_files)
+        return [upload for upload in uploads if upload not in archived]
+
+    def _upload_files(self, uploads, checksums=None, progress=None):
+        """
+        Upload a list of (local_file, dest_path) pairs. Files are uploaded in parallel by a pool of
+        ARTIFACTORY_UPLOAD_WORKERS threads, or one after another when it is set to 1.
+        Failures are collected per file and raised together once all uploads completed.
+        """
+        checksums = checksums or {}
+        failures = {}
+        total = len(uploads)
+        # progress is reported by the threaded transport only
+        if self.settings.async_transport and progress is None:
+            async_uploads = [(local_file, dest_path) for local_file, dest_path in uploads
+                             if not self._use_checksum_deploy(local_file)
+                             and not 0 < self.settings.multipart_threshold <= os.path.getsize(local_file)]
+            if async_uploads:
+                from plugin.async_repository import run_sync
+                failures.update(run_sync(self._async_repository().upload_files(async_uploads)))
+                async_uploads = set(async_uploads)
+                uploads = [upload for upload in uploads if upload not in async_uploads]
+        if self.settings.upload_workers <= 1 or len(uploads) <= 1:
+            for local_file, dest_path in uploads:
+                try:
+                    self._upload_file(local_file, dest_path, checksums.get(local_file), progress)
+                except Exception as e:
+                    failures[dest_path] = e
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.settings.upload_workers, len(uploads)),
+                                    thread_name_prefix="JFrogUpload") as executor:
+                futures = {executor.submit(self._upload_file, local_file, dest_path, checksums.get(local_file),
+                                           progress): dest_path
+                           for local_file, dest_path in uploads}
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failures[futures[future]] = e
+
+        if failures:
+            details = "\n".join(f"{path}: {error}" for path, error in sorted(failures.items()))
+            raise Exception(f"Failed uploading {len(failures)} of {total} artifacts "
+                            f"to {self.rt_url}/{self.repository}:\n{details}")
+
+    def _upload_file(self, local_file, dest_path, checksums=None, progress=None):
+        _logger.debug("_upload_file %s put into path %s", local_file, dest_path)
+        size = os.path.getsize(local_file)
+        if self._use_checksum_deploy(local_file):
+            from plugin.checksums import file_checksums
+            checksums = checksums or file_checksums(local_file)
+            if self._checksum_deploy(local_file, dest_path, checksums):
+                if progress is not None:
+                    progress.complete_file(dest_path, size)
+                return
+        if 0 < self.settings.multipart_threshold <= size:
+            from plugin.multipart import MultipartUpload
+            upload = MultipartUpload(self._request, self.rt_url, self.repository, local_file, dest_path,
+                                     self.settings.multipart_part_size, self.settings.multipart_workers,
+                                     self.settings.multipart_part_retries,
+                                     progress.start_file(dest_path, size) if progress is not None else None,
+                                     self.throttle, checksums[0] if checksums else None)
+            if upload.upload():
+                return
+        r = self._request("PUT", self._artifact_url(dest_path),
+                          body=lambda: self._upload_stream(local_file, dest_path, size, progress))
+        _logger.debug("_upload_file put status %s reason %s", r.status_code, r.reason)
+        r.raise_for_status()
 
+    def _upload_stream(self, source, dest_path, size, progress=None):
+        """A new request body for an upload attempt of `source`, a local file or a buffer."""
+        on_chunk = progress.start_file(dest_path, size) if progress is not None else None
+        return UploadStream(source, self.settings.upload_chunk_size, on_chunk, self.throttle)
+
+    def _use_checksum_deploy(self, local_file):
+        return self.settings.checksum_deploy and os.path.getsize(local_file) >= self.settings.checksum_deploy_min_size
+
+    def _checksum_deploy(self, local_file, dest_path, checksums):
+        """
+        Deploy a file by its checksums only, letting Artifactory link content it already stores.
+        Returns False when Artifactory does not have the content and the file must be uploaded.
+        """
+        sha1, sha256 = checksums
+        size = os.path.getsize(local_file)
+        r = self._request("PUT", self._artifact_url(dest_path), headers={
+            "X-Checksum-Deploy": "true",
+            "X-Checksum-Sha1": sha1,
+            "X-Checksum-Sha256": sha256,
+        })
+        _logger.debug("_checksum_deploy %s status %s reason %s", dest_path, r.status_code, r.reason)
+        if r.status_code == 404:
+            with self._stats_lock:
+                self.checksum_deploy_stats["uploaded_files"] += 1
+            metrics.inc("artifactory_checksum_deploys_total", outcome="uploaded")
+            return False
+        r.raise_for_status()
+        with self._stats_lock:
+            self.checksum_deploy_stats["deployed_files"] += 1
+            self.checksum_deploy_stats["bytes_saved"] += size
+        metrics.inc("artifactory_checksum_deploys_total", outcome="deployed")
+        metrics.inc("artifactory_checksum_deploy_bytes_saved_total", size)
+        return True
+
+    def _download_to(self, remote_file_path, f):
+        """
+        Stream a remote file into the open file `f`. When the transfer is interrupted it is resumed
+        from the last received byte with a Range request, as long as the retry policy allows.
+        """
+        written = 0
+        for attempt in range(self.retry.attempts):
+            headers = {"Range": f"bytes={written}-"} if written else None
+            try:
+                with self._request("GET", self._artifact_url(remote_file_path), stream=True, headers=headers) as r:
+                    r.raise_for_status()
+                    if written and r.status_code != 206:
+                        # the server ignored the Range header and sends the whole file again
+                        f.seek(0)
+                        f.truncate()
+                        written = 0
+                    for chunk in r.iter_content(chunk_size=self.settings.download_chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                            written += len(chunk)
+                            metrics.inc("artifactory_bytes_received_total", len(chunk))
+                            self.throttle.transfer(len(chunk))
+                return
+            except RETRYABLE_EXCEPTIONS as e:
+                if attempt == self.retry.attempts - 1:
+                    raise
+                _logger.debug("download of %s interrupted after %d bytes, resuming %s", remote_file_path, written, e)
+                time.sleep(self.retry.delay(attempt))
+
+    def _async_repository(self):
+        """The asyncio repository transfers are delegated to when ARTIFACTORY_ASYNC_TRANSPORT is set."""
+        if self._async_repository_instance is None:
+            from plugin.async_repository import AsyncJFrogArtifactoryRepository
+            self._async_repository_instance = AsyncJFrogArtifactoryRepository(self.artifact_uri)
+        return self._async_repository_instance
+
+    def _request(self, method, url, body=None, **kwargs):
+        return self.retry.request(self.session, method, url, body, self.throttle, **kwargs)
+
+    def _artifact_url(self, artifact_path):
+        return self.rt_url + "/" + self.repository + "/" + artifact_path
+
+    @instrument("list_artifacts")
     def list_artifacts(self, path=None):
-        if self.debug_mode:
-            print(f"JFrog: list_artifacts in path={path} " )
-        path = '' if path is None else "/" + path
+        _logger.debug("list_artifacts in path=%s", path)
+        if not self.listing_cache.enabled:
+            return [entry.to_file_info() for entry in self.iter_artifacts(path)]
+        key = (self.rt_url, self.repository, path.strip("/") if path else "")
+        generation = self.listing_cache.generation
+        entries = self.listing_cache.get(key)
+        if entries is None:
+            entries = list(self.iter_artifacts(path))
+            if not self.listing_cache.put(key, entries, generation):
+                _logger.debug("list_artifacts not caching path=%s, invalidated while listed", path)
+        else:
+            _logger.debug("list_artifacts cache hit for path=%s", path)
+        return [entry.to_file_info() for entry in entries]
+
+    def _invalidate_listings(self, path):
+        if self.listing_cache.enabled:
+            self.listing_cache.invalidate(self.rt_url, self.repository, path)
+
+    def iter_artifacts(self, path=None):
+        """
+        Generate the direct children of `path` as ArtifactEntry (path, is_dir, file_size) records, parsed
+        from the storage API response while it is received. Unlike list_artifacts, the memory used does
+        not grow with the size of the listing.
+        """
+        path = '' if not path else "/" + path.strip("/")
+        entries = self._list_children(path)
+        if entries is None:
+            # 404 - the path does not exist, 400 - the path is a file, neither has children
+            return
+        parent_dir = path.lstrip("/") + "/" if path else ""
+        for file in entries:
+            yield ArtifactEntry(parent_dir + file['uri'].lstrip('/'), file['folder'], file['size'])
 
+    def _list_children(self, path):
+        """
+        Return an iterator of the storage API entries of the direct children of `path`,
+        or None when it is not a folder.
+        """
+        path = '' if not path else "/" + path.strip("/")
+        return self._stream_listing(self.rt_url + "/api/storage/" + self.repository + path
+                                    + "?list&deep=0&depth=1&listFolders=1")
 
-        r = requests.get(self.rt_url + "/api/storage/" + self.repository + path, headers=self.get_headers())
+    def _list_deep(self, path=None):
+        """
+        List all files and folders under `path` recursively with a single storage API call.
+        Returns an iterator of the storage API entries, with `uri` relative to `path`,
+        or None when `path` is not a folder.
+        """
+        path = '' if not path else "/" + path
+        return self._stream_listing(self.rt_url + "/api/storage/" + self.repository + path
+                                    + "?list&deep=1&listFolders=1")
+
+    def _stream_listing(self, url):
+        # listings are read while their files are downloaded, they must not hold an in-flight slot meanwhile
+        r = self._request("GET", url, stream=True, hold_slot=False)
+        if r.status_code in (400, 404):
+            _logger.debug("no listing of %s, status %s", url, r.status_code)
+            r.close()
+            return None
         if r.status_code != 200:
+            r.close()
             raise Exception(f"Error: {r.status_code} {r.reason}")
-        item_info = r.json()
-        if 'children' not in item_info or len(item_info['children']) == 0:
-            if self.debug_mode:
-                print("JFrog: list_artifacts no children in path")
-            return []
-
-        r = requests.get(
-            self.rt_url + "/api/storage/" + self.repository + path + "?list&deep=0&depth=1&listFolders=1",
-            headers=self.get_headers())
+        return self._iter_listing(r)
+
+    @staticmethod
+    def _iter_listing(r):
+        """Generate the "files" entries of a storage API listing response, parsed as it is read."""
+        try:
+            yield from iter_array(r.iter_content(_LISTING_CHUNK_SIZE), "files")
+        finally:
+            r.close()
+
+    def _list_tree(self, path=None):
+        """
+        List all files and folders under `path` as an iterable of storage API entries, with `uri` relative
+        to `path`, or None when `path` is not a folder. With ARTIFACTORY_DOWNLOAD_LISTING set to walk, the
+        tree is listed folder by folder while the entries are consumed, rather than by one deep listing.
+        """
+        if self.settings.download_listing != "walk":
+            return self._list_deep(path)
+        entries = self._list_children(path)
+        if entries is None:
+            return None
+        return self._walk(path, entries)
+
+    def _walk(self, path, entries):
+        """Generate the entries of the tree under `path` breadth first, `entries` being its children."""
+        path = path.strip("/") if path else ""
+        folders = collections.deque([""])
+        while folders:
+            folder = folders.popleft()
+            if folder:
+                entries = self._list_children(path + folder if path else folder.lstrip("/")) or []
+            for entry in entries:
+                uri = folder + "/" + entry["uri"].strip("/")
+                if entry["folder"]:
+                    folders.append(uri)
+                yield dict(entry, uri=uri)
+
+    @instrument("download_artifacts")
+    def download_artifacts(self, artifact_path, dst_path=None):
+        """
+        Download a directory using a listing of its whole tree (see _list_tree) and a pool of
+        ARTIFACTORY_DOWNLOAD_WORKERS threads, files are downloaded while the listing is consumed.
+        The item info of `artifact_path` tells a file from a directory, a file is then downloaded
+        with the size and checksum of its info.
+        """
+        if dst_path:
+            dst_path = os.path.abspath(dst_path)
+            if not os.path.isdir(dst_path):
+                raise MlflowException(f"The destination path for downloaded artifacts must be an existing "
+                                      f"directory! Destination path: {dst_path}")
+        if artifact_path and artifact_path.strip("/"):
+            item_info = self._get_item_info(artifact_path)
+            if "children" not in item_info:
+                remote_file_path = artifact_path.strip("/")
+                local_path = self._create_download_destination(remote_file_path, dst_path or create_tmp_dir())
+                try:
+                    self._download_file(remote_file_path, local_path, *self._file_info(item_info))
+                finally:
+                    if self.download_cache is not None:
+                        self.download_cache.evict()
+                return local_path
+        entries = self._list_tree(artifact_path)
+        if entries is None:
+            try:
+                return super(JFrogArtifactoryRepository, self).download_artifacts(artifact_path, dst_path)
+            finally:
+                if self.download_cache is not None:
+                    self.download_cache.evict()
+
+        dst_path = dst_path or create_tmp_dir()
+        local_dir = os.path.join(dst_path, os.path.normpath(artifact_path)) if artifact_path else dst_path
+        _logger.debug("download_artifacts %s into %s", artifact_path, local_dir)
+
+        def downloads():
+            for entry in entries:
+                rel_path = entry["uri"].strip("/")
+                local_path = os.path.normpath(os.path.join(local_dir, rel_path))
+                if os.path.commonpath([local_path, dst_path]) != dst_path:
+                    raise MlflowException(f"Invalid artifact path in listing of {artifact_path}: {rel_path}")
+                if entry["folder"]:
+                    os.makedirs(local_path, exist_ok=True)
+                else:
+                    remote_path = artifact_path.strip("/") + "/" + rel_path if artifact_path else rel_path
+                    yield remote_path, local_path, entry.get("sha2"), entry.get("size")
+
+        self._download_files(downloads())
+        return local_dir
+
+    def _download_files(self, downloads):
+        """
+        Download (remote_file_path, local_path, sha256, size) tuples in parallel by a pool of
+        ARTIFACTORY_DOWNLOAD_WORKERS threads. `downloads` may be a generator producing them while files
+        are downloaded, at most ARTIFACTORY_DOWNLOAD_QUEUE_SIZE downloads are queued at any time.
+        Failures are collected per file and raised together once all downloads completed.
+        """
+        failures = {}
+        failures_lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.settings.download_queue_size)
+        total = 0
+        async_downloads = []
+
+        def download(remote_file_path, local_path, sha256, size):
+            try:
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                self._download_file(remote_file_path, local_path, sha256, size)
+            except Exception as e:
+                with failures_lock:
+                    failures[remote_file_path] = e
+            finally:
+                slots.release()
+
+        def download_async():
+            from plugin.async_repository import run_sync
+            async_failures = run_sync(self._async_repository().download_files(async_downloads))
+            with failures_lock:
+                failures.update(async_failures)
+            async_downloads.clear()
+
+        use_async = self.settings.async_transport and self.download_cache is None
+        with ThreadPoolExecutor(max_workers=self.settings.download_workers,
+                                thread_name_prefix="JFrogDownload") as executor:
+            for remote_file_path, local_path, sha256, size in downloads:
+                total += 1
+                if use_async and (size is None or not 0 < self.settings.ranged_download_threshold <= int(size)):
+                    async_downloads.append((remote_file_path, local_path))
+                    if len(async_downloads) >= self.settings.download_queue_size:
+                        download_async()
+                    continue
+                slots.acquire()
+                executor.submit(download, remote_file_path, local_path, sha256, size)
+            if async_downloads:
+                download_async()
+        if self.download_cache is not None:
+            self.download_cache.evict()
+
+        if failures:
+            details = "\n".join(f"{path}: {error}" for path, error in sorted(failures.items()))
+            raise Exception(f"Failed downloading {len(failures)} of {total} artifacts "
+                            f"from {self.rt_url}/{self.repository}:\n{details}")
+
+    def _download_file(self, remote_file_path, local_path, sha256=None, size=None):
+        _logger.debug("_download_file in remote_file_path=%s, local_path=%s", remote_file_path, local_path)
+
+        if ((size is None and self.settings.ranged_download_threshold > 0)
+                or (sha256 is None and self.download_cache is not None)):
+            sha256, size = self._file_info(self._get_item_info(remote_file_path))
+        if self.download_cache is None or not sha256:
+            return self._download_to_file(remote_file_path, local_path, sha256, size)
+        self.download_cache.fetch(sha256, local_path,
+                                  lambda path: self._download_to_file(remote_file_path, path, sha256, size))
+
+    def _get_item_info(self, path):
+        """Return the storage API item info of a file or folder, folders have "children"."""
+        r = self._request("GET", self.rt_url + "/api/storage/" + self.repository + "/" + path.strip("/"))
         if r.status_code != 200:
             raise Exception(f"Error: {r.status_code} {r.reason}")
+        return r.json()
 
-        file_info_objects = []
-        json_result = r.json()
-        arr = json_result['uri'].split(self.repository + "/")
-        parent_dir = arr[1] if len(arr) > 1 and arr[1] else None
-        for file in r.json().get("files", []):
-            file_uri = file['uri'].lstrip('/')
-            filename = parent_dir + "/" + file_uri if parent_dir else file_uri
-            file_info = FileInfo(filename, file['folder'], file['size'])
-            file_info_objects.append(file_info)
-        return file_info_objects
-
-    def _download_file(self, remote_file_path, local_path):
-        print(f"JFrog: _download_file in remote_file_path={remote_file_path}, local_path={local_path} ")
-
-        with requests.get(
-                self.rt_url + "/" + self.repository + "/" + remote_file_path, headers=self.get_headers(), stream=True) as r:
-            r.raise_for_status()
-            with open(local_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+    @staticmethod
+    def _file_info(item_info):
+        """Return the (sha256, size) of a file from its item info."""
+        size = item_info.get("size")
+        return item_info.get("checksums", {}).get("sha256"), int(size) if size is not None else None
 
+    def _download_to_file(self, remote_file_path, local_path, sha256=None, size=None):
+        # download into a temporary file of the destination directory, renamed once complete
+        fd, tmp_path = download_tempfile(local_path)
+        os.close(fd)
+        try:
+            if size is not None and 0 < self.settings.ranged_download_threshold <= int(size):
+                from plugin.ranged_download import RangedDownload, RangesNotSupported
+                try:
+                    RangedDownload(self._request, self.retry, self._artifact_url(remote_file_path), int(size),
+                                   self.settings.ranged_download_part_size, self.settings.ranged_download_workers,
+                                   self.settings.download_chunk_size, sha256, self.throttle).download(tmp_path)
+                    os.replace(tmp_path, local_path)
+                    return
+                except RangesNotSupported as e:
+                    _logger.debug("ranged download of %s not supported, %s", remote_file_path, e)
+            with open(tmp_path, 'wb') as f:
+                self._download_to(remote_file_path, f)
+            os.replace(tmp_path, local_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @instrument("delete_artifacts")
     def delete_artifacts(self, artifact_path=None):
-        print(f"JFrog: delete skip in artifact_path={artifact_path}, is set to {self.artifacts_delete_skip}")
-        if self.debug_mode:
-            print("JFrog: uri = {} repo={}".format(self.rt_url, self.repository))
+        _logger.debug("delete skip in artifact_path=%s, is set to %s", artifact_path,
+                      self.settings.artifacts_delete_skip)
 
-        if self.artifacts_delete_skip == "true":
+        if self.settings.artifacts_delete_skip == "true":
             return
 
-        dest_path = self.rt_url + "/" + self.repository
-        if artifact_path is not None and len(artifact_path)>0:
-            dest_path = dest_path + "/" + artifact_path
+        try:
+            self._delete_path(artifact_path)
+        finally:
+            self._invalidate_listings(artifact_path)
 
-        if self.debug_mode:
-            print(f'DELETE path: {dest_path}')
-        with requests.delete(
-                dest_path, headers=self.get_headers(), stream=True) as r:
-            r.raise_for_status()
+    @instrument("delete_artifacts_bulk")
+    def delete_artifacts_bulk(self, artifact_paths, progress_callback=None):
+        """
+        Delete many artifact paths concurrently, e.g. the artifacts of all runs collected by a garbage
+        collection, using a pool of ARTIFACTORY_DELETE_WORKERS threads. Paths which do not exist are
+        considered deleted.
+        `progress_callback(completed, total, artifact_path, error)` is called as each path completes.
+        Returns {artifact_path: None, or the exception raised deleting it}.
+        """
+        artifact_paths = list(artifact_paths)
+        if self.settings.artifacts_delete_skip == "true":
+            return {artifact_path: None for artifact_path in artifact_paths}
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.settings.delete_workers, len(artifact_paths))),
+                                thread_name_prefix="JFrogDelete") as executor:
+            futures = {executor.submit(self._delete_path, artifact_path, True): artifact_path
+                       for artifact_path in artifact_paths}
+            for future in as_completed(futures):
+                artifact_path = futures[future]
+                try:
+                    future.result()
+                    error = None
+                except Exception as e:
+                    error = e
+                results[artifact_path] = error
+                _logger.debug("delete_artifacts_bulk %d/%d path=%s error=%s",
+                              len(results), len(artifact_paths), artifact_path, error)
+                if progress_callback is not None:
+                    progress_callback(len(results), len(artifact_paths), artifact_path, error)
+        for artifact_path in artifact_paths:
+            self._invalidate_listings(artifact_path)
+        return results
 
+    def _delete_path(self, artifact_path, missing_ok=False):
+        repo_path = self.repository
+        if artifact_path is not None and len(artifact_path)>0:
+            repo_path = repo_path + "/" + artifact_path
+
+        _logger.debug("DELETE path: %s/%s", self.rt_url, repo_path)
+        with self._request("DELETE", self.rt_url + "/" + repo_path, stream=True) as r:
+            if not (missing_ok and r.status_code == 404):
+                r.raise_for_status()
+        if self.settings.delete_skip_trash:
+            # remove the deleted items from the trash can as well, 404 when not in the trash can (or it is disabled)
+            with self._request("DELETE", self.rt_url + "/api/trash/clean/" + repo_path) as r:
+                if r.status_code != 404:
+                    r.raise_for_status()
 
     def get_headers(self):
        headers = {
-            "Authorization": f"Bearer {self.token}",
+            "Authorization": f"Bearer {self.settings.token}",
             "User-Agent": f"mlflow-jfrog-plugin/{VERSION}"
         }
-       return headers
\ No newline at end of file
+       return headers
+
+
+# MLflow creates repositories of the same few artifact URIs over and over
+parse_artifact_uri = functools.lru_cache(maxsize=1024)(JFrogArtifactoryRepository.extract_uri)
+
+
+if MultipartDownloadMixin is not None:
+    class SignedUrlJFrogArtifactoryRepository(JFrogArtifactoryRepository, MultipartDownloadMixin):
+        """
+        Repository created when ARTIFACTORY_SIGNED_URLS is set. The MLflow tracking server advertises
+        presigned downloads for repositories implementing MultipartDownloadMixin, clients then download
+        artifacts directly from Artifactory with the signed URLs it hands out, instead of streaming them
+        through the server.
+        """
+
+        def get_download_presigned_url(self, artifact_path, expiration=300):
+            """
+            Return an Artifactory signed URL downloading `artifact_path` for `expiration` seconds.
+            Raises the MLflow "presigned download not supported" error when Artifactory does not sign it.
+            """
+            artifact_path = artifact_path.strip("/")
+            r = self._request("POST", self.rt_url + "/api/signed/url", json={
+                "repo_path": self.repository + "/" + artifact_path,
+                "valid_for_secs": int(expiration),
+            })
+            if r.status_code in (400, 403, 404, 405, 501):
+                # signed URLs require an Enterprise+ license and a token allowed to sign them
+                _logger.warning("Artifactory signed URL of %s not created, status %s: %s",
+                                artifact_path, r.status_code, r.text)
+                raise _UnsupportedPresignedDownloadException()
+            r.raise_for_status()
+            _, size = self._file_info(self._get_item_info(artifact_path))
+            return PresignedDownloadUrlResponse(url=r.text.strip(), headers={}, file_size=size)
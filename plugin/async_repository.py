@@ -0,0 +1,348 @@
+# This plugin was developed by JFrog
+
+import asyncio
+import atexit
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+import time
+import weakref
+
+from mlflow.entities import FileInfo
+from mlflow.store.artifact.artifact_repo import verify_artifact_path
+
+from plugin.artifactory_repository import (JFrogArtifactoryRepository, VERSION, download_tempfile, get_settings,
+                                           parse_artifact_uri)
+from plugin.metrics import instrument, metrics
+from plugin.retry import record_request, record_retry
+from plugin.throttle import OVERLOAD_STATUS_CODES, get_throttle
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_logger = logging.getLogger(__name__)
+
+# aiohttp sessions are bound to the event loop they were created in, they are shared per loop
+_sessions = weakref.WeakKeyDictionary()
+# the ARTIFACTORY_ASYNC_MAX_CONCURRENCY semaphores, shared by all repositories of a loop
+_semaphores = weakref.WeakKeyDictionary()
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+
+
+def _get_async_session(headers, pool_size):
+    sessions = _sessions.setdefault(asyncio.get_running_loop(), {})
+    key = (pool_size, tuple(sorted(headers.items())))
+    session = sessions.get(key)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=pool_size, limit_per_host=pool_size)
+        session = sessions[key] = aiohttp.ClientSession(headers=headers, connector=connector)
+    return session
+
+
+def _get_semaphore(max_concurrency):
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(max_concurrency)
+    if semaphore is None:
+        semaphore = semaphores[max_concurrency] = asyncio.Semaphore(max_concurrency)
+    return semaphore
+
+
+async def close_sessions():
+    """Close the sessions of the running event loop."""
+    for session in _sessions.pop(asyncio.get_running_loop(), {}).values():
+        await session.close()
+
+
+def _background_loop():
+    global _loop, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name="JFrogAsyncTransport", daemon=True).start()
+        return _loop
+
+
+@atexit.register
+def _close_background_loop():
+    if _loop is not None and _loop_pid == os.getpid() and _loop.is_running():
+        try:
+            asyncio.run_coroutine_threadsafe(close_sessions(), _loop).result(timeout=5)
+        except Exception:
+            pass
+
+
+def _release_slot_with(r, release_slot):
+    """Release the in-flight slot of a response along with it, or once it is garbage collected."""
+    release = r.release
+
+    def release_with_slot():
+        try:
+            return release()
+        finally:
+            release_slot()
+
+    r.release = release_with_slot
+    weakref.finalize(r, release_slot)
+
+
+async def _sleep(delay):
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def run_sync(coroutine):
+    """
+    Run a coroutine on the event loop shared by all threads of the process and wait for its result.
+    This is the sync facade used by JFrogArtifactoryRepository, it must not be called from that loop.
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, _background_loop()).result()
+
+
+class AsyncJFrogArtifactoryRepository:
+    """
+    asyncio-native variant of JFrogArtifactoryRepository built on aiohttp, for servers running many
+    concurrent transfers per process. Connections are pooled per event loop (ARTIFACTORY_POOL_SIZE) and
+    the number of in-flight transfers of all instances of a loop is bounded by ARTIFACTORY_ASYNC_MAX_CONCURRENCY.
+    Transfers share the bandwidth limits and host back off of the threaded transfers, and are held to
+    the in-flight request limits by the slots of their loop, separately from threads.
+    """
+
+    def __init__(self, artifact_uri, max_concurrency=None):
+        if aiohttp is None:
+            raise Exception("The asyncio Artifactory repository requires aiohttp, "
+                            "install it with `pip install mlflow-jfrog-plugin[async]`")
+        self.artifact_uri = artifact_uri
+        self.settings = get_settings()
+        self.rt_url, self.repository = parse_artifact_uri(artifact_uri, self.settings.rt_no_ssl)
+        self.max_concurrency = max_concurrency or self.settings.async_max_concurrency
+        self.retry = self.settings.retry
+        self.throttle = get_throttle(self.rt_url, **self.settings.throttle_settings)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the pooled connections of the running event loop, they are shared by all instances of the loop."""
+        await close_sessions()
+
+    def get_headers(self):
+        return {
+            "Authorization": f"Bearer {self.settings.token}",
+            "User-Agent": f"mlflow-jfrog-plugin/{VERSION}"
+        }
+
+    def _semaphore(self):
+        return _get_semaphore(self.max_concurrency)
+
+    def _artifact_url(self, artifact_path):
+        return self.rt_url + "/" + self.repository + "/" + artifact_path
+
+    async def _request(self, method, url, body=None, **kwargs):
+        """
+        Send a request with the retry policy of RetryPolicy.request, `body` being a callable returning
+        a new request body for every attempt. The caller must release the returned response, which holds
+        an in-flight slot of the throttle until then.
+        """
+        session = _get_async_session(self.get_headers(), self.settings.pool_size)
+        for attempt in range(self.retry.attempts):
+            release_slot = await self.throttle.acquire_async()
+            data = None
+            start = time.perf_counter()
+            try:
+                data = body() if body is not None else None
+                with metrics.in_flight("artifactory_requests_in_flight"):
+                    r = await session.request(method, url, data=data, **kwargs)
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                release_slot()
+                record_request(method, type(e).__name__, start)
+                if attempt == self.retry.attempts - 1:
+                    raise
+                record_retry(method, type(e).__name__)
+                await asyncio.sleep(self.retry.delay(attempt))
+                continue
+            except BaseException:
+                release_slot()
+                raise
+            finally:
+                if hasattr(data, "close"):
+                    data.close()
+            _release_slot_with(r, release_slot)
+            record_request(method, r.status, start)
+            if r.status in OVERLOAD_STATUS_CODES:
+                self.throttle.overloaded(self.retry.delay(attempt, r))
+            if r.status not in self.retry.status_codes or attempt == self.retry.attempts - 1:
+                return r
+            r.release()
+            record_retry(method, r.status)
+            await asyncio.sleep(self.retry.delay(attempt, r))
+
+    @instrument("log_artifact")
+    async def log_artifact(self, local_file, artifact_path=None):
+        verify_artifact_path(artifact_path)
+        dest_path = os.path.basename(local_file)
+        if artifact_path:
+            dest_path = posixpath.join(artifact_path, os.path.basename(local_file))
+        await self.upload_file(local_file, dest_path)
+
+    @instrument("log_artifacts")
+    async def log_artifacts(self, local_dir, artifact_path=None):
+        verify_artifact_path(artifact_path)
+        uploads = JFrogArtifactoryRepository.list_local_files(os.path.abspath(local_dir), artifact_path or "")
+        failures = await self.upload_files(uploads)
+        if failures:
+            details = "\n".join(f"{path}: {error}" for path, error in sorted(failures.items()))
+            raise Exception(f"Failed uploading {len(failures)} of {len(uploads)} artifacts "
+                            f"to {self.rt_url}/{self.repository}:\n{details}")
+
+    async def upload_files(self, uploads):
+        """Upload (local_file, dest_path) pairs concurrently, returns {dest_path: exception} of failed uploads."""
+        results = await asyncio.gather(*(self.upload_file(local_file, dest_path) for local_file, dest_path in uploads),
+                                       return_exceptions=True)
+        return {dest_path: result for (_, dest_path), result in zip(uploads, results) if isinstance(result, Exception)}
+
+    async def upload_file(self, local_file, dest_path):
+        _logger.debug("async upload_file %s put into path %s", local_file, dest_path)
+        async with self._semaphore():
+            # aiohttp streams the file on its own, its bytes are reserved before it is sent
+            await _sleep(self.throttle.transfer_delay(os.path.getsize(local_file)))
+            r = await self._request("PUT", self._artifact_url(dest_path), body=lambda: open(local_file, "rb"))
+            try:
+                r.raise_for_status()
+            finally:
+                r.release()
+        metrics.inc("artifactory_bytes_sent_total", os.path.getsize(local_file))
+
+    @instrument("list_artifacts")
+    async def list_artifacts(self, path=None):
+        path = '' if not path else "/" + path.strip("/")
+        async with self._semaphore():
+            r = await self._request(
+                "GET", self.rt_url + "/api/storage/" + self.repository + path + "?list&deep=0&depth=1&listFolders=1")
+            try:
+                if r.status in (400, 404):
+                    return []
+                if r.status != 200:
+                    raise Exception(f"Error: {r.status} {r.reason}")
+                json_result = await r.json(content_type=None)
+            finally:
+                r.release()
+        parent_dir = path.lstrip("/")
+        file_info_objects = []
+        for file in json_result.get("files", []):
+            file_uri = file['uri'].lstrip('/')
+            filename = parent_dir + "/" + file_uri if parent_dir else file_uri
+            file_info_objects.append(FileInfo(filename, file['folder'], file['size']))
+        return file_info_objects
+
+    async def _list_deep(self, path=None):
+        path = '' if not path else "/" + path.strip("/")
+        async with self._semaphore():
+            r = await self._request("GET", self.rt_url + "/api/storage/" + self.repository + path
+                                    + "?list&deep=1&listFolders=1")
+            try:
+                if r.status in (400, 404):
+                    return None
+                if r.status != 200:
+                    raise Exception(f"Error: {r.status} {r.reason}")
+                return (await r.json(content_type=None)).get("files", [])
+            finally:
+                r.release()
+
+    @instrument("download_artifacts")
+    async def download_artifacts(self, artifact_path, dst_path=None):
+        """Download a file or directory into dst_path (a new temporary directory by default), returns its local path."""
+        dst_path = os.path.abspath(dst_path or tempfile.mkdtemp())
+        local_path = os.path.join(dst_path, os.path.normpath(artifact_path)) if artifact_path else dst_path
+        entries = await self._list_deep(artifact_path)
+        if entries is None:
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            await self.download_file(artifact_path, local_path)
+            return local_path
+        downloads = []
+        for entry in entries:
+            rel_path = entry["uri"].strip("/")
+            entry_local_path = os.path.normpath(os.path.join(local_path, rel_path))
+            if os.path.commonpath([entry_local_path, dst_path]) != dst_path:
+                raise Exception(f"Invalid artifact path in listing of {artifact_path}: {rel_path}")
+            if entry["folder"]:
+                os.makedirs(entry_local_path, exist_ok=True)
+            else:
+                remote_path = artifact_path.strip("/") + "/" + rel_path if artifact_path else rel_path
+                downloads.append((remote_path, entry_local_path))
+        failures = await self.download_files(downloads)
+        if failures:
+            details = "\n".join(f"{path}: {error}" for path, error in sorted(failures.items()))
+            raise Exception(f"Failed downloading {len(failures)} of {len(downloads)} artifacts "
+                            f"from {self.rt_url}/{self.repository}:\n{details}")
+        return local_path
+
+    async def download_files(self, downloads):
+        """Download (remote_file_path, local_path) pairs concurrently, returns {remote_file_path: exception} of failures."""
+        async def download(remote_file_path, local_path):
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            await self.download_file(remote_file_path, local_path)
+
+        results = await asyncio.gather(*(download(remote_file_path, local_path)
+                                         for remote_file_path, local_path in downloads), return_exceptions=True)
+        return {remote_file_path: result for (remote_file_path, _), result in zip(downloads, results)
+                if isinstance(result, Exception)}
+
+    async def download_file(self, remote_file_path, local_path):
+        """Download a file into a temporary file renamed to local_path once complete, resuming interrupted transfers."""
+        async with self._semaphore():
+            loop = asyncio.get_running_loop()
+            fd, tmp_path = download_tempfile(local_path)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    written = 0
+                    for attempt in range(self.retry.attempts):
+                        headers = {"Range": f"bytes={written}-"} if written else None
+                        try:
+                            r = await self._request("GET", self._artifact_url(remote_file_path), headers=headers)
+                            try:
+                                r.raise_for_status()
+                                if written and r.status != 206:
+                                    f.seek(0)
+                                    f.truncate()
+                                    written = 0
+                                async for chunk in r.content.iter_chunked(self.settings.download_chunk_size):
+                                    await loop.run_in_executor(None, f.write, chunk)
+                                    written += len(chunk)
+                                    metrics.inc("artifactory_bytes_received_total", len(chunk))
+                                    await _sleep(self.throttle.transfer_delay(len(chunk)))
+                            finally:
+                                r.release()
+                            break
+                        except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                            if attempt == self.retry.attempts - 1:
+                                raise
+                            await asyncio.sleep(self.retry.delay(attempt))
+                os.replace(tmp_path, local_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    @instrument("delete_artifacts")
+    async def delete_artifacts(self, artifact_path=None):
+        if self.settings.artifacts_delete_skip == "true":
+            return
+        dest_path = self.rt_url + "/" + self.repository
+        if artifact_path:
+            dest_path = dest_path + "/" + artifact_path
+        async with self._semaphore():
+            r = await self._request("DELETE", dest_path)
+            try:
+                r.raise_for_status()
+            finally:
+                r.release()
@@ -0,0 +1,33 @@
+# This plugin was developed by JFrog
+
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def file_checksums(path, algorithms=("sha1", "sha256")):
+    """Return the hex digests of a file for `algorithms`, default (sha1, sha256), reading it in fixed size buffers."""
+    hashes = [hashlib.new(algorithm) for algorithm in algorithms]
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            for h in hashes:
+                h.update(view[:n])
+    return tuple(h.hexdigest() for h in hashes)
+
+
+def compute_checksums(paths, processes=1):
+    """
+    Return {path: (sha1, sha256)} for the given files, hashing them in a pool of `processes`
+    processes when more than one is requested.
+    """
+    paths = list(paths)
+    if processes <= 1 or len(paths) <= 1:
+        return {path: file_checksums(path) for path in paths}
+    with ProcessPoolExecutor(max_workers=min(processes, len(paths))) as executor:
+        return dict(zip(paths, executor.map(file_checksums, paths, chunksize=8)))
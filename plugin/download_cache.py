@@ -0,0 +1,174 @@
+# This plugin was developed by JFrog
+
+import hashlib
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on `path`, held across threads and processes of the node."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class DownloadCache:
+    """
+    On-disk content-addressed cache of downloaded artifacts, shared by all processes of a node.
+
+    Files are stored read-only under `objects/` by their SHA-256 and are hard-linked (or copied,
+    when linking is not possible) to their download destination. A lock file per checksum makes
+    concurrent processes wait for a single download of the same content. `evict` removes the least
+    recently used files once the cache exceeds `max_size` bytes.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        self.locks_dir = os.path.join(self.cache_dir, "locks")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.locks_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def _lock_path(self, sha256):
+        return os.path.join(self.locks_dir, sha256 + ".lock")
+
+    @staticmethod
+    def _touch(object_path):
+        """Mark an object as recently used for evict."""
+        try:
+            os.utime(object_path)
+        except OSError as e:
+            # objects downloaded by another user of a node-shared cache cannot be touched, which
+            # only makes them evicted earlier
+            _logger.debug("download cache object %s not touched, %s", object_path, e)
+
+    def fetch(self, sha256, local_path, download):
+        """
+        Place the content with the given SHA-256 at `local_path`, calling `download(path)` to
+        download it into the cache when it is not cached yet.
+        """
+        sha256 = sha256.lower()
+        object_path = self._object_path(sha256)
+        try:
+            self._place(object_path, local_path)
+            self._touch(object_path)
+            with self._stats_lock:
+                self.hits += 1
+            return
+        except FileNotFoundError:
+            pass
+        # evict removes objects under the same lock, the object stays until it is placed
+        with file_lock(self._lock_path(sha256)):
+            cached = os.path.exists(object_path)
+            if not cached:
+                self._download(sha256, object_path, download)
+            self._place(object_path, local_path)
+            if cached:
+                self._touch(object_path)
+        with self._stats_lock:
+            if cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _download(self, sha256, object_path, download):
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(object_path), suffix=".tmp")
+        os.close(fd)
+        try:
+            download(tmp_path)
+            actual = _sha256(tmp_path)
+            if actual != sha256:
+                raise Exception(f"Checksum mismatch of downloaded content, expected sha256 {sha256} got {actual}")
+            # cached content is shared by hard links, it must not be modified through a download destination
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_path, object_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _place(object_path, local_path):
+        if os.path.lexists(local_path):
+            os.remove(local_path)
+        try:
+            os.link(object_path, local_path)
+        except OSError:
+            shutil.copyfile(object_path, local_path)
+
+    def evict(self):
+        """Remove the least recently used files until the cache size is below its maximum size."""
+        with file_lock(os.path.join(self.locks_dir, "evict.lock")):
+            entries = []
+            total = 0
+            for root, _, filenames in os.walk(self.objects_dir):
+                for filename in filenames:
+                    if filename.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, filename)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+            if total <= self.max_size:
+                return
+            for mtime, size, path in sorted(entries):
+                # wait for the fetches of the object to have placed it
+                with file_lock(self._lock_path(os.path.basename(path))):
+                    try:
+                        if os.stat(path).st_mtime != mtime:
+                            # used since the cache was scanned
+                            continue
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                if total <= self.max_size:
+                    break
+
+    def stats(self):
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses}
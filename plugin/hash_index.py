@@ -0,0 +1,81 @@
+# This plugin was developed by JFrog
+
+import json
+import logging
+import os
+import tempfile
+import time
+
+from plugin.checksums import compute_checksums
+from plugin.download_cache import file_lock
+
+_logger = logging.getLogger(__name__)
+
+# files modified this recently may still change within the same mtime, their checksums are not kept
+_MTIME_GRACE_NS = 2 * 1000 * 1000 * 1000
+
+
+class HashIndex:
+    """
+    Persisted {absolute path: (size, mtime_ns, sha1, sha256)} index of local files, so unchanged files
+    are not hashed again by every sync of the same directory. The index is a JSON file shared by all
+    processes of the node, updates are merged into it under a file lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._updates = {}
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            _logger.warning("Ignoring corrupted hash index %s: %s", self.path, e)
+            return {}
+
+    def checksums(self, paths, processes=1):
+        """Return {path: (sha1, sha256)}, hashing only the files changed since they were indexed."""
+        if self._entries is None:
+            self._entries = self._load()
+        result = {}
+        stale = {}
+        for path in paths:
+            st = os.stat(path)
+            key = os.path.abspath(path)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                result[path] = (entry[2], entry[3])
+            else:
+                stale[path] = (key, st)
+        hashed_at = time.time_ns()
+        for path, checksums in compute_checksums(stale, processes).items():
+            result[path] = checksums
+            key, st = stale[path]
+            if st.st_mtime_ns < hashed_at - _MTIME_GRACE_NS:
+                self._updates[key] = self._entries[key] = [st.st_size, st.st_mtime_ns, *checksums]
+        _logger.debug("hash index %s: %d files hashed, %d unchanged", self.path, len(stale), len(result) - len(stale))
+        return result
+
+    def save(self):
+        """Merge the checksums computed since the last save into the index file, dropping deleted files."""
+        if not self._updates:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with file_lock(self.path + ".lock"):
+            entries = self._load()
+            entries.update(self._updates)
+            entries = {key: entry for key, entry in entries.items() if os.path.exists(key)}
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        self._entries = entries
+        self._updates = {}
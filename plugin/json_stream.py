@@ -0,0 +1,112 @@
+# This plugin was developed by JFrog
+
+import codecs
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_ELEMENT_END = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+
+
+class _Reader:
+    """Text buffer over a stream of byte chunks, refilled as values are decoded from it."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read the next chunk into the buffer, returns False at the end of the stream."""
+        if self.eof:
+            return False
+        # drop the consumed text, so the buffer never holds more than a chunk and the value being decoded
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.buffer += self._decoder.decode(chunk)
+                return True
+        self.buffer += self._decoder.decode(b"", final=True)
+        self.eof = True
+        return False
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it, "" at the end of the stream."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == "" or char not in chars:
+            raise ValueError(f"Invalid JSON listing, expected one of {chars!r} got {char!r}")
+        self.pos += 1
+        return char
+
+    def elements(self):
+        """Generate the elements of the array starting at the current position, up to its closing bracket."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            # decode all the elements of the buffer before refilling it, the separator following an
+            # element tells it is complete
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                match = _ELEMENT_END.match(self.buffer, end)
+            except json.JSONDecodeError:
+                match = None
+            if match is None:
+                if not self.fill():
+                    raise ValueError("Invalid JSON listing, unterminated array")
+                self.peek()
+                continue
+            self.pos = match.end()
+            yield value
+            if match.group(1) == "]":
+                return
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+                # a value ending with the buffer (e.g. a number) may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill()
+
+
+def iter_array(chunks, key):
+    """
+    Generate the elements of the array `key` of the JSON object streamed as byte `chunks`, decoding
+    one element at a time so the whole document is never held in memory. Other members of the object
+    are decoded and skipped.
+    """
+    reader = _Reader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key:
+            yield from reader.elements()
+        else:
+            reader.value()
+        if reader.expect(",}") == "}":
+            return
@@ -0,0 +1,114 @@
+# This plugin was developed by JFrog
+
+import threading
+import time
+from collections import OrderedDict
+
+from plugin.metrics import metrics
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_listing_cache(ttl, max_size):
+    """Return the listing cache of the current process, shared by all repository instances."""
+    key = (ttl, max_size)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ListingCache(ttl, max_size)
+        return cache
+
+
+class ListingCache:
+    """
+    Bounded LRU cache of artifact listings keyed by (Artifactory URL, repository, path),
+    entries expire `ttl` seconds after they were stored. Its activity is counted by the
+    artifactory_listing_cache_* metrics.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # bumped by every invalidation, a listing read while it changed may already be stale
+        self.generation = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_size > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                metrics.inc("artifactory_listing_cache_lookups_total", result="miss")
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                metrics.inc("artifactory_listing_cache_expirations_total")
+                metrics.inc("artifactory_listing_cache_lookups_total", result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.inc("artifactory_listing_cache_lookups_total", result="hit")
+            return list(value)
+
+    def put(self, key, value, generation=None):
+        """
+        Store the listing of `key`. When `generation` is given, the listing is only stored if no
+        invalidation happened since `generation` was read, as it may have been listed before the change.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, list(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                metrics.inc("artifactory_listing_cache_evictions_total")
+            return True
+
+    def invalidate(self, rt_url, repository, path):
+        """
+        Drop the cached listings affected by a change of `path`: the listings of `path`, of its
+        parent folders and of anything below it.
+        """
+        path = path.strip("/") if path else ""
+        with self._lock:
+            self.generation += 1
+            for key in list(self._entries):
+                key_url, key_repository, key_path = key
+                if key_url != rt_url or key_repository != repository:
+                    continue
+                if (not key_path or not path or key_path == path or path.startswith(key_path + "/")
+                        or key_path.startswith(path + "/")):
+                    del self._entries[key]
+                    self.invalidations += 1
+                    metrics.inc("artifactory_listing_cache_invalidations_total")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,241 @@
+# This plugin was developed by JFrog
+
+import contextlib
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+_logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_HELP = {
+    "artifactory_operations_total": "Repository operations by operation and outcome",
+    "artifactory_operation_duration_seconds": "Duration of repository operations",
+    "artifactory_operations_in_flight": "Repository operations in progress",
+    "artifactory_requests_total": "Artifactory HTTP requests by method and status code",
+    "artifactory_request_duration_seconds": "Time until the response headers of Artifactory HTTP requests",
+    "artifactory_requests_in_flight": "Artifactory HTTP requests waiting for their response",
+    "artifactory_retries_total": "Retried Artifactory HTTP requests by method and reason",
+    "artifactory_bytes_sent_total": "Artifact bytes uploaded",
+    "artifactory_bytes_received_total": "Artifact bytes downloaded",
+    "artifactory_checksum_deploys_total": "Checksum deploys by outcome, deployed or uploaded",
+    "artifactory_checksum_deploy_bytes_saved_total": "Artifact bytes not uploaded thanks to checksum deploys",
+    "artifactory_listing_cache_lookups_total": "Listing cache lookups by result, hit or miss",
+    "artifactory_listing_cache_evictions_total": "Listings evicted from the listing cache when it is full",
+    "artifactory_listing_cache_expirations_total": "Listings of the listing cache found expired",
+    "artifactory_listing_cache_invalidations_total": "Listings of the listing cache invalidated by changes",
+    "artifactory_throttled_seconds_total": "Time requests and transfers were delayed by the client-side throttling",
+    "artifactory_throttle_backoffs_total": "Back offs of all requests to a host answering 429 or 503",
+}
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(DURATION_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Process-wide counters, gauges and duration histograms of the plugin, keyed by metric name and a
+    tuple of (label, value) pairs. They are exposed by `snapshot()`, in the Prometheus text format by
+    `render()`, and are served over HTTP on ARTIFACTORY_METRICS_PORT when it is set.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add_gauge(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def in_flight(self, name, **labels):
+        self.add_gauge(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add_gauge(name, -1, **labels)
+
+    def snapshot(self):
+        """Return {"counters": ..., "gauges": ..., "histograms": {key: (count, sum)}}, keys being (name, labels)."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {key: (h.count, h.sum) for key, h in self._histograms.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, list(h.counts), h.sum, h.count) for key, h in self._histograms.items())
+        lines = []
+        declared = set()
+
+        def declare(name, metric_type):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            declare(name, "gauge")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), counts, total, count in histograms:
+            declare(name, "histogram")
+            for bound, bucket_count in zip(DURATION_BUCKETS, counts):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    values = ",".join('{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"'))
+                      for key, value in labels)
+    return "{" + values + "}"
+
+
+metrics = Metrics()
+
+
+@contextlib.contextmanager
+def operation(name, **attributes):
+    """
+    Instrument a repository operation: its duration, outcome and concurrency are recorded, it is logged
+    at debug level and, when ARTIFACTORY_OTEL_TRACING is set and OpenTelemetry is installed, it is
+    traced as a span of the current trace.
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    span = contextlib.nullcontext()
+    if trace is not None and os.getenv("ARTIFACTORY_OTEL_TRACING", "false").lower() == "true":
+        span = trace.get_tracer("mlflow-jfrog-plugin").start_as_current_span(
+            f"artifactory.{name}", attributes={f"artifactory.{key}": str(value) for key, value in attributes.items()})
+    with span, metrics.in_flight("artifactory_operations_in_flight", operation=name):
+        try:
+            yield
+            outcome = "success"
+        finally:
+            duration = time.perf_counter() - start
+            metrics.inc("artifactory_operations_total", operation=name, outcome=outcome)
+            metrics.observe("artifactory_operation_duration_seconds", duration, operation=name)
+            _logger.debug("%s %s %s in %.3fs", name, attributes, outcome, duration)
+
+
+def instrument(name):
+    """Decorator recording every call of a repository method, or coroutine, as an `operation`."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with operation(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with operation(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_pid = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """
+    Serve the metrics on http://<host>:<port>/metrics from a daemon thread, once per process.
+    Every forked process (e.g. gunicorn workers) needs its own port, the port of a process failing
+    to bind it is logged and ignored.
+    """
+    global _server, _server_pid
+    with _server_lock:
+        if _server_pid == os.getpid():
+            return _server
+        _server_pid = os.getpid()
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            _logger.warning("Could not serve the Artifactory metrics on port %s: %s", port, e)
+            _server = None
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="JFrogMetrics", daemon=True).start()
+        return _server
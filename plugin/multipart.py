@@ -0,0 +1,196 @@
+# This plugin was developed by JFrog
+
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from plugin.checksums import file_checksums
+from plugin.metrics import metrics
+
+_logger = logging.getLogger(__name__)
+
+UPLOADS_API = "/api/v1/uploads/"
+UPLOAD_TOKEN_HEADER = "X-JFrog-Upload-Token"
+NODE_ID_HEADER = "X-Artifactory-Node-Id"
+MB = 1024 * 1024
+
+
+class FileSection:
+    """
+    Read-only file-like view of `length` bytes of a file starting at `offset`.
+    Passed as a request body it is streamed in small reads, so a part is never loaded into memory.
+    """
+
+    def __init__(self, path, offset, length, throttle=None):
+        self._file = open(path, "rb")
+        self._throttle = throttle
+        self._file.seek(offset)
+        self._remaining = length
+        self.len = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        if self._throttle is not None:
+            self._throttle.transfer(len(data))
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class MultipartUpload:
+    """
+    Uploads a large file in parts through Artifactory's multipart upload API, the protocol of JFrog CLI.
+
+    The upload is created for the target repository path with the SHA-1 of the file, parts are uploaded
+    concurrently to the pre-signed part URLs returned by Artifactory, then the upload is completed and its
+    status polled until Artifactory assembled the file. Completed parts are kept track of, so a failed
+    part is retried on its own instead of restarting the whole file.
+    Requests are sent through `request(method, url, body=None, **kwargs)`, see RetryPolicy.request,
+    `on_part(length)` is called once each part is stored and sent bytes are limited by the bandwidth
+    of `throttle`. Part sizes are whole megabytes, `part_size` is rounded down to them.
+    """
+
+    # seconds between polls of the completion status, and before giving up on it
+    status_interval = 1.0
+    status_timeout = 3600.0
+
+    def __init__(self, request, rt_url, repository, local_file, dest_path, part_size, workers, part_retries,
+                 on_part=None, throttle=None, sha1=None):
+        self.request = request
+        self.rt_url = rt_url
+        self.repository = repository
+        self.local_file = local_file
+        self.dest_path = dest_path
+        self.file_size = os.path.getsize(local_file)
+        self.part_size_mb = max(1, part_size // MB)
+        self.part_size = self.part_size_mb * MB
+        self.workers = workers
+        self.part_retries = part_retries
+        self.on_part = on_part
+        self.throttle = throttle
+        self.sha1 = sha1
+        self.num_parts = max(1, math.ceil(self.file_size / self.part_size))
+        self.token = None
+        self.completed_parts = set()
+        self._lock = threading.Lock()
+
+    def create(self):
+        """Start the upload, returns False when the server does not support multipart uploads."""
+        if self.sha1 is None:
+            self.sha1 = file_checksums(self.local_file, ("sha1",))[0]
+        r = self.request("POST", self.rt_url + UPLOADS_API + "create", params={
+            "repoPath": self.repository + "/" + self.dest_path,
+            "partSizeMB": self.part_size_mb,
+        }, headers={"X-Checksum-Sha1": self.sha1})
+        if r.status_code in (400, 404, 405, 501):
+            _logger.debug("multipart upload not supported, status %s reason %s", r.status_code, r.reason)
+            return False
+        r.raise_for_status()
+        self.token = r.json()["token"]
+        return True
+
+    def upload(self):
+        """
+        Upload the file, returns False when multipart uploads are not supported and the file
+        should be uploaded as a single request instead.
+        """
+        if not self.create():
+            return False
+        try:
+            pending = [n for n in range(1, self.num_parts + 1)]
+            for attempt in range(self.part_retries + 1):
+                pending, errors = self._upload_parts(pending)
+                if not pending:
+                    break
+                _logger.debug("multipart upload attempt %d of %s failed for parts %s, retrying",
+                              attempt + 1, self.dest_path, pending)
+            if pending:
+                raise Exception(f"Failed uploading parts {pending} of {self.dest_path}: "
+                                f"{errors[pending[0]]}")
+            self.complete()
+        except BaseException:
+            self.abort()
+            raise
+        return True
+
+    def _upload_parts(self, part_numbers):
+        errors = {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(part_numbers)),
+                                thread_name_prefix="JFrogMultipart") as executor:
+            futures = {executor.submit(self._upload_part, n): n for n in part_numbers}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[futures[future]] = e
+        return sorted(errors), errors
+
+    def _upload_part(self, part_number):
+        r = self.request("POST", self.rt_url + UPLOADS_API + "urlRequest", params={"partNumber": part_number},
+                         headers=self._token_headers())
+        r.raise_for_status()
+        part_url = r.json()["url"]
+        offset = (part_number - 1) * self.part_size
+        length = min(self.part_size, self.file_size - offset)
+        # part URLs are pre-signed, they must not carry the Artifactory credentials
+        r = self.request("PUT", part_url, body=lambda: FileSection(self.local_file, offset, length, self.throttle),
+                         headers={"Authorization": None})
+        r.raise_for_status()
+        metrics.inc("artifactory_bytes_sent_total", length)
+        with self._lock:
+            self.completed_parts.add(part_number)
+        if self.on_part is not None:
+            self.on_part(length)
+
+    def complete(self):
+        """Complete the upload and wait for Artifactory to assemble the file from its parts."""
+        headers = self._token_headers()
+        r = self.request("POST", self.rt_url + UPLOADS_API + "complete", params={"sha1": self.sha1},
+                         headers=headers)
+        r.raise_for_status()
+        # the status is polled on the node assembling the file
+        node_id = r.headers.get(NODE_ID_HEADER)
+        if node_id:
+            headers[NODE_ID_HEADER] = node_id
+        deadline = time.monotonic() + self.status_timeout
+        while True:
+            r = self.request("POST", self.rt_url + UPLOADS_API + "status", headers=headers)
+            r.raise_for_status()
+            status = r.json()
+            if status.get("status") == "FINISHED":
+                return
+            if status.get("status") == "ABORTED" or status.get("error"):
+                raise Exception(f"Multipart upload of {self.dest_path} failed: "
+                                f"{status.get('error') or status.get('status')}")
+            if time.monotonic() > deadline:
+                raise Exception(f"Multipart upload of {self.dest_path} not completed after "
+                                f"{self.status_timeout} seconds, status {status.get('status')}")
+            _logger.debug("multipart upload of %s status %s progress %s", self.dest_path,
+                          status.get("status"), status.get("progress"))
+            time.sleep(self.status_interval)
+
+    def abort(self):
+        if self.token is None:
+            return
+        try:
+            self.request("POST", self.rt_url + UPLOADS_API + "abort", headers=self._token_headers())
+        except Exception as e:
+            _logger.debug("multipart upload abort of %s failed %s", self.dest_path, e)
+
+    def _token_headers(self):
+        return {UPLOAD_TOKEN_HEADER: self.token}
@@ -0,0 +1,125 @@
+# This plugin was developed by JFrog
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+from plugin.metrics import metrics
+from plugin.retry import RETRYABLE_EXCEPTIONS
+
+_logger = logging.getLogger(__name__)
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+class RangesNotSupported(Exception):
+    pass
+
+
+def get_segment_executor(workers):
+    """
+    Return the thread pool of the current process downloading the segments of all ranged downloads, so
+    large files downloaded concurrently keep at most `workers` Range requests in flight together instead of
+    `workers` each, which would exceed the connection pool of the session.
+    """
+    key = (os.getpid(), workers)
+    executor = _executors.get(key)
+    if executor is not None:
+        return executor
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="JFrogRangedDownload")
+            # the threads of a parent process do not exist after a fork
+            for stale_key in [k for k in _executors if k[0] != key[0]]:
+                del _executors[stale_key]
+            _executors[key] = executor
+        return executor
+
+
+class RangedDownload:
+    """
+    Downloads a large file as concurrent HTTP Range requests of `part_size` bytes, sent by the `workers`
+    threads shared by all ranged downloads of the process (see get_segment_executor).
+
+    The destination file is preallocated to the file size and every segment is written at its own
+    offset through a separate file handle, so segments are never reassembled in memory. An
+    interrupted segment is resumed from its last received byte. The SHA-256 of the downloaded
+    file is verified once all segments completed.
+    Requests are sent through `request(method, url, body=None, **kwargs)`, see RetryPolicy.request,
+    and received bytes are limited by the bandwidth of `throttle`.
+    """
+
+    def __init__(self, request, retry, url, size, part_size, workers, chunk_size, sha256=None, throttle=None):
+        self.request = request
+        self.retry = retry
+        self.url = url
+        self.size = size
+        self.part_size = part_size
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.sha256 = sha256
+        self.throttle = throttle
+
+    def download(self, path):
+        """Download into `path`, raises RangesNotSupported when the server ignores Range requests."""
+        with open(path, "wb") as f:
+            f.truncate(self.size)
+        segments = [(offset, min(self.part_size, self.size - offset))
+                    for offset in range(0, self.size, self.part_size)]
+        executor = get_segment_executor(self.workers)
+        futures = [executor.submit(self._download_segment, path, offset, length) for offset, length in segments]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except BaseException:
+            # the segments must not write into the file once the caller removed it
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            raise
+        if self.sha256:
+            self.verify(path)
+
+    def _download_segment(self, path, offset, length):
+        received = 0
+        with open(path, "r+b") as f:
+            f.seek(offset)
+            for attempt in range(self.retry.attempts):
+                start = offset + received
+                headers = {"Range": f"bytes={start}-{offset + length - 1}"}
+                try:
+                    with self.request("GET", self.url, stream=True, headers=headers) as r:
+                        r.raise_for_status()
+                        if r.status_code != 206:
+                            raise RangesNotSupported(f"Range request answered with status {r.status_code}")
+                        for chunk in r.iter_content(chunk_size=self.chunk_size):
+                            if chunk:
+                                f.write(chunk)
+                                received += len(chunk)
+                                metrics.inc("artifactory_bytes_received_total", len(chunk))
+                                if self.throttle is not None:
+                                    self.throttle.transfer(len(chunk))
+                    if received != length:
+                        raise Exception(f"Incomplete segment at offset {offset}, received {received} of {length} bytes")
+                    return
+                except RETRYABLE_EXCEPTIONS as e:
+                    if attempt == self.retry.attempts - 1:
+                        raise
+                    _logger.debug("segment at offset %d of %s interrupted after %d bytes, resuming %s",
+                                  offset, self.url, received, e)
+                    time.sleep(self.retry.delay(attempt))
+
+    def verify(self, path):
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        if sha256.hexdigest() != self.sha256.lower():
+            raise Exception(f"Checksum mismatch of downloaded {self.url}, expected sha256 {self.sha256} "
+                            f"got {sha256.hexdigest()}")
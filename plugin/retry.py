@@ -0,0 +1,145 @@
+# This plugin was developed by JFrog
+
+import os
+import random
+import time
+import weakref
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from plugin.metrics import metrics
+from plugin.throttle import OVERLOAD_STATUS_CODES
+
+RETRYABLE_EXCEPTIONS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class RetryPolicy:
+    """
+    Retries Artifactory requests failing with a transient error: connection errors, timeouts and
+    responses with one of `status_codes`. Retries wait with an exponential backoff starting at
+    `backoff` seconds and bounded by `max_backoff`, randomized by full jitter, unless the response
+    asks for a longer wait through Retry-After.
+    """
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30.0, jitter=True,
+                 status_codes=(429, 500, 502, 503, 504)):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_codes = frozenset(status_codes)
+
+    @classmethod
+    def from_env(cls):
+        status_codes = os.getenv("ARTIFACTORY_RETRY_STATUS_CODES", "429,500,502,503,504")
+        return cls(
+            retries=int(os.getenv("ARTIFACTORY_RETRIES", "3")),
+            backoff=float(os.getenv("ARTIFACTORY_RETRY_BACKOFF", "0.5")),
+            max_backoff=float(os.getenv("ARTIFACTORY_RETRY_MAX_BACKOFF", "30")),
+            jitter=os.getenv("ARTIFACTORY_RETRY_JITTER", "true").lower() == "true",
+            status_codes=[int(code) for code in status_codes.split(",") if code.strip()],
+        )
+
+    @property
+    def attempts(self):
+        return self.retries + 1
+
+    def delay(self, attempt, response=None):
+        """Seconds to wait before retrying after the given (zero based) failed attempt."""
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def request(self, session, method, url, body=None, throttle=None, hold_slot=True, **kwargs):
+        """
+        Send a request, retrying it on transient failures. `body` is a callable returning a new
+        request body for every attempt (e.g. a newly opened file), so bodies are always sent from
+        their start. Every attempt is sent within the limits of `throttle`, a Throttle, which backs off
+        the host when it is overloaded, the slot of a streamed response being held until it is closed
+        unless `hold_slot` is False. The response of the last attempt is returned, its status is not checked.
+        """
+        for attempt in range(self.attempts):
+            data = body() if body is not None else None
+            start = time.perf_counter()
+            try:
+                r = _send(session, method, url, data, throttle, hold_slot, **kwargs)
+            except RETRYABLE_EXCEPTIONS as e:
+                record_request(method, type(e).__name__, start)
+                if attempt == self.attempts - 1:
+                    raise
+                record_retry(method, type(e).__name__)
+                time.sleep(self.delay(attempt))
+                continue
+            finally:
+                if hasattr(data, "close"):
+                    data.close()
+            record_request(method, r.status_code, start)
+            if throttle is not None and r.status_code in OVERLOAD_STATUS_CODES:
+                throttle.overloaded(self.delay(attempt, r))
+            if r.status_code not in self.status_codes or attempt == self.attempts - 1:
+                return r
+            r.close()
+            record_retry(method, r.status_code)
+            time.sleep(self.delay(attempt, r))
+
+
+def _send(session, method, url, data, throttle, hold_slot, **kwargs):
+    release = throttle.acquire() if throttle is not None else None
+    try:
+        with metrics.in_flight("artifactory_requests_in_flight"):
+            r = session.request(method, url, data=data, **kwargs)
+    except BaseException:
+        if release is not None:
+            release()
+        raise
+    if release is None:
+        return r
+    if not (hold_slot and kwargs.get("stream")):
+        release()
+        return r
+    close = r.close
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            release()
+
+    r.close = close_and_release
+    # a streamed response dropped without being closed still gives its slot back
+    weakref.finalize(r, release)
+    return r
+
+
+def record_request(method, status, start):
+    """Record a request answered with `status`, a status code or the name of the exception raised."""
+    metrics.inc("artifactory_requests_total", method=method, status=status)
+    metrics.observe("artifactory_request_duration_seconds", time.perf_counter() - start, method=method)
+
+
+def record_retry(method, reason):
+    metrics.inc("artifactory_retries_total", method=method, reason=reason)
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,211 @@
+# This plugin was developed by JFrog
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+from plugin.metrics import metrics
+
+# responses of an overloaded Artifactory, upon which all requests to its host back off
+OVERLOAD_STATUS_CODES = (429, 503)
+
+_limits = {}
+_throttles = {}
+_lock = threading.Lock()
+
+
+def throttle_settings():
+    """The get_throttle arguments set through the ARTIFACTORY_* environment variables."""
+    return {
+        "max_requests": int(os.getenv("ARTIFACTORY_MAX_REQUESTS", "0")),
+        "host_max_requests": int(os.getenv("ARTIFACTORY_HOST_MAX_REQUESTS", "0")),
+        "bytes_per_second": int(os.getenv("ARTIFACTORY_MAX_BYTES_PER_SECOND", "0")),
+        "host_bytes_per_second": int(os.getenv("ARTIFACTORY_HOST_MAX_BYTES_PER_SECOND", "0")),
+        "adaptive_backoff": os.getenv("ARTIFACTORY_ADAPTIVE_BACKOFF", "true").lower() == "true",
+    }
+
+
+def get_throttle(rt_url, max_requests=0, host_max_requests=0, bytes_per_second=0, host_bytes_per_second=0,
+                 adaptive_backoff=True):
+    """
+    Return the throttle of the requests of the current process to the host of `rt_url`. Its global limits
+    are shared with the requests to all other hosts, 0 meaning unlimited.
+    """
+    host = urlsplit(rt_url).netloc
+    key = (host, max_requests, host_max_requests, bytes_per_second, host_bytes_per_second, adaptive_backoff)
+    throttle = _throttles.get(key)
+    if throttle is not None:
+        return throttle
+    with _lock:
+        throttle = _throttles.get(key)
+        if throttle is None:
+            throttle = _throttles[key] = Throttle(_limit(None, max_requests, bytes_per_second),
+                                                  _limit(host, host_max_requests, host_bytes_per_second),
+                                                  adaptive_backoff)
+        return throttle
+
+
+def _limit(host, max_requests, bytes_per_second):
+    key = (host, max_requests, bytes_per_second)
+    limit = _limits.get(key)
+    if limit is None:
+        limit = _limits[key] = Limit(max_requests, bytes_per_second)
+    return limit
+
+
+class TokenBucket:
+    """
+    Limits a transfer rate to `rate` bytes per second, allowing bursts of up to one second of transfer.
+    Tokens are reserved before bytes are sent or received, going into debt when there are not enough of them.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n):
+        """Reserve `n` bytes, returns the seconds to wait before transferring them."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= n
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class Limit:
+    """
+    In-flight requests and bytes per second limits, 0 meaning unlimited. The in-flight requests of
+    threads take `slots`, those of the coroutines of an event loop the slots of `loop_slots()`.
+    """
+
+    def __init__(self, max_requests=0, bytes_per_second=0):
+        self.max_requests = max_requests
+        self.slots = threading.BoundedSemaphore(max_requests) if max_requests > 0 else None
+        self.bucket = TokenBucket(bytes_per_second) if bytes_per_second > 0 else None
+        # asyncio semaphores are bound to the event loop they are used in, they are created per loop
+        self._loop_slots = weakref.WeakKeyDictionary()
+
+    def loop_slots(self):
+        loop = asyncio.get_running_loop()
+        slots = self._loop_slots.get(loop)
+        if slots is None:
+            slots = self._loop_slots[loop] = asyncio.BoundedSemaphore(self.max_requests)
+        return slots
+
+
+class Throttle:
+    """
+    Client-side throttling of the requests to an Artifactory host, so high-throughput transfers do not
+    starve other users of a shared Artifactory. Requests wait for a slot of the global and host in-flight
+    limits (acquire, or acquire_async in an event loop), transferred bytes for tokens of the global and host
+    bandwidth limits. When the host answers
+    429 or 503, all requests to it back off for the delay of the retry policy, or its Retry-After.
+    The time spent throttled is counted by reason in artifactory_throttled_seconds_total.
+    """
+
+    def __init__(self, global_limit, host_limit, adaptive_backoff=True):
+        self.limits = [limit for limit in (global_limit, host_limit) if limit.slots is not None]
+        self.buckets = [limit.bucket for limit in (global_limit, host_limit) if limit.bucket is not None]
+        self.adaptive_backoff = adaptive_backoff
+        self.paused_until = 0.0
+
+    def acquire(self):
+        """
+        Take an in-flight slot of the global and host limits to send a request, returns the function
+        releasing them, which may be called more than once.
+        """
+        time.sleep(self.backoff_delay())
+        if not self.limits:
+            return _release_nothing
+        acquired = []
+        try:
+            for limit in self.limits:
+                if not limit.slots.acquire(blocking=False):
+                    start = time.monotonic()
+                    limit.slots.acquire()
+                    _throttled("requests", time.monotonic() - start)
+                acquired.append(limit.slots)
+        except BaseException:
+            _releaser(acquired)()
+            raise
+        return _releaser(acquired)
+
+    async def acquire_async(self):
+        """
+        acquire for the coroutines of the running event loop, which take the slots of the loop. The requests
+        of a loop are limited as those of the threads, separately from them.
+        """
+        delay = self.backoff_delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not self.limits:
+            return _release_nothing
+        acquired = []
+        try:
+            for limit in self.limits:
+                slots = limit.loop_slots()
+                if slots.locked():
+                    start = time.monotonic()
+                    await slots.acquire()
+                    _throttled("requests", time.monotonic() - start)
+                else:
+                    await slots.acquire()
+                acquired.append(slots)
+        except BaseException:
+            _releaser(acquired)()
+            raise
+        return _releaser(acquired)
+
+    def transfer(self, n):
+        """Wait for the bandwidth limits to allow transferring `n` bytes."""
+        if self.buckets:
+            time.sleep(self.transfer_delay(n))
+
+    def transfer_delay(self, n):
+        """Reserve `n` bytes of the bandwidth limits, returns the seconds to wait before transferring them."""
+        if not self.buckets:
+            return 0.0
+        delay = max(bucket.reserve(n) for bucket in self.buckets)
+        _throttled("bandwidth", delay)
+        return delay
+
+    def backoff_delay(self):
+        """Seconds to wait before sending a request while the host is backed off."""
+        delay = self.paused_until - time.monotonic()
+        if delay <= 0:
+            return 0.0
+        _throttled("backoff", delay)
+        return delay
+
+    def overloaded(self, delay):
+        """Back off all requests to the host for `delay` seconds, after a 429 or 503 response."""
+        if self.adaptive_backoff:
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            metrics.inc("artifactory_throttle_backoffs_total")
+
+
+def _release_nothing():
+    pass
+
+
+def _releaser(slots):
+    """A function releasing `slots` in reverse order, only the first time it is called."""
+    released = threading.Lock()
+
+    def release():
+        if released.acquire(blocking=False):
+            for semaphore in reversed(slots):
+                semaphore.release()
+
+    return release
+
+
+def _throttled(reason, seconds):
+    if seconds > 0:
+        metrics.inc("artifactory_throttled_seconds_total", seconds, reason=reason)
@@ -0,0 +1,40 @@
+# This plugin was developed by JFrog
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(headers, pool_size):
+    """
+    Return the pooled keep-alive session of the current process for the given request headers.
+    Sessions are shared by all repository instances and threads of a process, and are re-created
+    after a fork (e.g. gunicorn workers) so connections are never shared between processes.
+    `pool_size` is the size of the connection pool, set through ARTIFACTORY_POOL_SIZE.
+    """
+    key = (os.getpid(), pool_size, tuple(sorted(headers.items())))
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _create_session(headers, pool_size)
+            for stale_key in [k for k in _sessions if k[0] != key[0]]:
+                del _sessions[stale_key]
+            _sessions[key] = session
+        return session
+
+
+def _create_session(headers, pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(headers)
+    return session
@@ -0,0 +1,113 @@
+# This plugin was developed by JFrog
+
+import collections
+import os
+import threading
+import time
+
+from plugin.metrics import metrics
+
+Progress = collections.namedtuple("Progress", ["sent", "size", "bytes_per_second"])
+
+
+class UploadStream:
+    """
+    Request body streaming a local file, or an in-memory buffer, in chunks of at most `chunk_size` bytes.
+
+    Files are read into a single reused buffer and buffers are sent as zero-copy slices, so the memory
+    used by an upload is bounded by `chunk_size` whatever the size of the file. The stream has a length,
+    so it is sent with a Content-Length header rather than chunked transfer encoding.
+    `on_chunk(length)` is called once every chunk was sent, chunks are sent within the bandwidth of `throttle`.
+    """
+
+    def __init__(self, source, chunk_size, on_chunk=None, throttle=None):
+        self._file = None
+        self._buffer = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._buffer = memoryview(source).cast("B")
+            self._length = self._buffer.nbytes
+        else:
+            self._file = open(source, "rb", buffering=0)
+            self._length = os.fstat(self._file.fileno()).st_size
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        self.throttle = throttle
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        if self._buffer is not None:
+            for offset in range(0, self._length, self.chunk_size):
+                chunk = self._buffer[offset:offset + self.chunk_size]
+                self._throttle(len(chunk))
+                yield chunk
+                self._sent(len(chunk))
+            return
+        # the chunk is sent before the next one is read, so the buffer can be reused
+        buffer = memoryview(bytearray(min(self.chunk_size, max(self._length, 1))))
+        while True:
+            n = self._file.readinto(buffer)
+            if not n:
+                break
+            self._throttle(n)
+            yield buffer[:n]
+            self._sent(n)
+
+    def _throttle(self, n):
+        if self.throttle is not None:
+            self.throttle.transfer(n)
+
+    def _sent(self, n):
+        metrics.inc("artifactory_bytes_sent_total", n)
+        if self.on_chunk is not None:
+            self.on_chunk(n)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class UploadProgress:
+    """
+    Tracks the bytes sent of a set of uploads and reports them to
+    `progress_callback(dest_path, file_progress, total_progress)`, both being Progress tuples of
+    (sent, size, bytes_per_second). A retried upload restarts the progress of its file.
+    """
+
+    def __init__(self, progress_callback, total_size):
+        self.progress_callback = progress_callback
+        self.total_size = total_size
+        self.total_sent = 0
+        self.start = time.monotonic()
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def start_file(self, dest_path, size):
+        """Start (or restart) the upload of a file, returns the `on_chunk` callback of its UploadStream."""
+        now = time.monotonic()
+        with self._lock:
+            previous = self._files.get(dest_path)
+            if previous is not None:
+                self.total_sent -= previous[0]
+            self._files[dest_path] = [0, size, now]
+        return lambda n: self.update(dest_path, n)
+
+    def update(self, dest_path, n):
+        now = time.monotonic()
+        with self._lock:
+            state = self._files[dest_path]
+            state[0] += n
+            self.total_sent += n
+            file_progress = Progress(state[0], state[1], _rate(state[0], now - state[2]))
+            total_progress = Progress(self.total_sent, self.total_size, _rate(self.total_sent, now - self.start))
+        self.progress_callback(dest_path, file_progress, total_progress)
+
+    def complete_file(self, dest_path, size):
+        """Report a file stored without streaming its content (checksum deploy, archive or multipart parts)."""
+        self.start_file(dest_path, size)
+        self.update(dest_path, size)
+
+
+def _rate(sent, elapsed):
+    return sent / elapsed if elapsed > 0 else 0.0
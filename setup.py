@@ -11,6 +11,7 @@ setup(
                      "they become an integral part of the company's release lifecycle as any other artifact and are also covered by all the security tools provided through the JFrog platform.",
     packages=find_packages(),
     install_requires=["mlflow", "requests>=2.31.0"],
+    extras_require={"async": ["aiohttp>=3.8"]},
     entry_points={
         # Define a ArtifactRepository plugin for artifact URIs with scheme 'artifactory'
         "mlflow.artifact_repository": "artifactory=plugin.artifactory_repository:JFrogArtifactoryRepository",
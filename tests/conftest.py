@@ -0,0 +1,27 @@
+"""
+Fixtures shared by the tests and benchmarks running against the in-process mock Artifactory.
+"""
+import os
+
+import pytest
+from mock_artifactory import MockArtifactory
+
+REPO = "test-repo/subpath"
+# wall-clock assertions are flaky on shared machines, they are only reported with TIMING_CHECKS=false (as in CI)
+TIMING_CHECKS = os.getenv("TIMING_CHECKS", "true").lower() == "true"
+
+
+@pytest.fixture
+def mock_artifactory(monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_AUTH_TOKEN", "test-token")
+    monkeypatch.setenv("ARTIFACTORY_NO_SSL", "true")
+    monkeypatch.setenv("ARTIFACTORY_RETRY_BACKOFF", "0.01")
+    with MockArtifactory() as server:
+        yield server
+
+
+def create_repository(server, repo=REPO):
+    from plugin.artifactory_repository import JFrogArtifactoryRepository, clear_settings
+    # settings are read once per process, the tests change them between repositories
+    clear_settings()
+    return JFrogArtifactoryRepository(server.artifactory_uri(repo))
@@ -0,0 +1,405 @@
+"""
+In-process mock of the Artifactory REST endpoints used by the plugin, for tests and benchmarks that
+must run without a licensed Artifactory instance or network access.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+class MockArtifactory:
+    """
+    Keeps artifacts in memory as {"<repo>/<path>": bytes} and serves them over HTTP on 127.0.0.1.
+    Use as a context manager, the plugin URI for repository `repo` is `artifactory_uri(repo)`.
+    `latency` seconds are added to every request and, when `bandwidth` is set, request and response
+    bodies are transferred at most at `bandwidth` bytes per second per connection.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.lock = threading.Lock()
+        self.requests = []
+        self.failures = []
+        self.resets = []
+        self.trash_cleaned = []
+        self.explode_supported = True
+        self.latency = 0.0
+        # highest number of requests handled concurrently during their latency or artifact download
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self.bandwidth = None
+        # store uploads as empty files, for benchmarks measuring the memory used by the client
+        self.discard_content = False
+        # storage API list responses rendered in advance by folder path, served as is
+        self.listings = {}
+        self.multipart_supported = True
+        # multipart upload status polls answered PROCESSING before an upload is FINISHED
+        self.multipart_processing_polls = 0
+        self.signed_urls_supported = True
+        self.signed_urls = {}
+        self.uploads = {}
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.mock = self
+        self.port = self.server.server_address[1]
+        self.thread = None
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/artifactory"
+
+    def artifactory_uri(self, repo):
+        return f"artifactory://127.0.0.1:{self.port}/artifactory/{repo}"
+
+    def put(self, path, content):
+        with self.lock:
+            self.files[path.strip("/")] = content
+
+    def inject_failure(self, method, prefix, status=503, times=1):
+        """Answer the next `times` requests of `method` on paths starting with `prefix` with `status`."""
+        self.failures.append([method, prefix.strip("/"), status, times])
+
+    def inject_reset(self, prefix, times=1):
+        """Drop the connection half way through the next `times` downloads of paths starting with `prefix`."""
+        self.resets.append([prefix.strip("/"), times])
+
+    def count(self, method, prefix=""):
+        return sum(1 for m, p in self.requests if m == method and p.startswith(prefix))
+
+    def children(self, folder):
+        """Direct children of `folder` as {name: is_folder}."""
+        prefix = folder.strip("/") + "/" if folder.strip("/") else ""
+        result = {}
+        with self.lock:
+            paths = list(self.files)
+        for path in paths:
+            if not path.startswith(prefix):
+                continue
+            rest = path[len(prefix):]
+            name, _, remainder = rest.partition("/")
+            result[name] = result.get(name, False) or bool(remainder)
+        return result
+
+    def is_folder(self, path):
+        prefix = path.strip("/") + "/"
+        with self.lock:
+            return any(p.startswith(prefix) for p in self.files)
+
+
+_IO_CHUNK_SIZE = 64 * 1024
+
+
+def _checksums(content):
+    return {
+        "sha1": hashlib.sha1(content).hexdigest(),
+        "md5": hashlib.md5(content).hexdigest(),
+        "sha256": hashlib.sha256(content).hexdigest(),
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _parse(self):
+        parsed = urlparse(self.path)
+        path = unquote(parsed.path)
+        if path.startswith("/artifactory"):
+            path = path[len("/artifactory"):]
+        self.mock.requests.append((self.command, path))
+        if self.mock.latency:
+            with self._in_flight():
+                time.sleep(self.mock.latency)
+        return path.strip("/"), parse_qs(parsed.query, keep_blank_values=True)
+
+    def _injected_failure(self, path):
+        with self.mock.lock:
+            for failure in self.mock.failures:
+                method, prefix, status, times = failure
+                if method == self.command and path.startswith(prefix) and times > 0:
+                    failure[3] -= 1
+                    return status
+        return None
+
+    def _injected_reset(self, path):
+        with self.mock.lock:
+            for reset in self.mock.resets:
+                if path.startswith(reset[0]) and reset[1] > 0:
+                    reset[1] -= 1
+                    return True
+        return False
+
+    def _send(self, status, body=b"", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command == "GET" and self.mock.bandwidth and "/api/" not in self.path:
+            with self._in_flight():
+                self._write(body)
+        elif self.command != "HEAD":
+            self._write(body)
+
+    @contextlib.contextmanager
+    def _in_flight(self):
+        with self.mock.lock:
+            self.mock._in_flight += 1
+            self.mock.max_in_flight = max(self.mock.max_in_flight, self.mock._in_flight)
+        try:
+            yield
+        finally:
+            with self.mock.lock:
+                self.mock._in_flight -= 1
+
+    def _throttle(self, size):
+        if self.mock.bandwidth:
+            time.sleep(size / self.mock.bandwidth)
+
+    def _write(self, data):
+        view = memoryview(data)
+        for offset in range(0, len(view), _IO_CHUNK_SIZE):
+            chunk = view[offset:offset + _IO_CHUNK_SIZE]
+            self._throttle(len(chunk))
+            self.wfile.write(chunk)
+
+    def _read(self, size):
+        chunks = []
+        while size > 0:
+            chunk = self.rfile.read(min(size, _IO_CHUNK_SIZE))
+            if not chunk:
+                break
+            self._throttle(len(chunk))
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self._read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        return self._read(int(self.headers.get("Content-Length", 0)))
+
+    def do_PUT(self):
+        path, query = self._parse()
+        if self.mock.discard_content and "Content-Length" in self.headers:
+            remaining = int(self.headers["Content-Length"])
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, _IO_CHUNK_SIZE))
+                if not chunk:
+                    break
+                self._throttle(len(chunk))
+                remaining -= len(chunk)
+            self.mock.put(path, b"")
+            return self._send(201, {"path": "/" + path, "size": "0"})
+        body = self._read_body()
+        status = self._injected_failure(path)
+        if status:
+            return self._send(status)
+        if self.headers.get("X-Checksum-Deploy") == "true":
+            sha1 = self.headers.get("X-Checksum-Sha1")
+            with self.mock.lock:
+                content = next((c for c in self.mock.files.values() if hashlib.sha1(c).hexdigest() == sha1), None)
+            if content is None:
+                return self._send(404, {"errors": [{"status": 404, "message": "Checksum deploy failed"}]})
+            self.mock.put(path, content)
+            return self._send(201, {"path": "/" + path, "size": str(len(content))})
+        if path == "api/v1/uploads/part":
+            if "Authorization" in self.headers:
+                return self._send(400, {"errors": [{"status": 400, "message": "Pre-signed URL with credentials"}]})
+            upload = self.mock.uploads[query["token"][0]]
+            upload["parts"][int(query["partNumber"][0])] = body
+            return self._send(200, headers={"ETag": hashlib.md5(body).hexdigest()})
+        if self.headers.get("X-Explode-Archive") == "true":
+            if not self.mock.explode_supported:
+                return self._send(400, {"errors": [{"status": 400, "message": "Archive explode not supported"}]})
+            folder = path.rpartition("/")[0]
+            with zipfile.ZipFile(io.BytesIO(body)) as archive:
+                for name in archive.namelist():
+                    self.mock.put(folder + "/" + name if folder else name, archive.read(name))
+            return self._send(201, {"path": "/" + folder})
+        self.mock.put(path, body)
+        self._send(201, {"path": "/" + path, "size": str(len(body))})
+
+    def do_POST(self):
+        path, query = self._parse()
+        body = self._read_body()
+        status = self._injected_failure(path)
+        if status:
+            return self._send(status)
+        if path == "api/signed/url":
+            if not self.mock.signed_urls_supported:
+                return self._send(403, {"errors": [{"status": 403, "message": "Signed URLs are not supported"}]})
+            request = json.loads(body)
+            signature = hashlib.sha256(body + str(time.time()).encode()).hexdigest()
+            self.mock.signed_urls[signature] = (request["repo_path"], time.time() + request["valid_for_secs"])
+            url = f"{self.mock.url}/api/signed/download?signature={signature}"
+            return self._send(200, url.encode(), {"Content-Type": "text/plain"})
+        if not path.startswith("api/v1/uploads/") or not self.mock.multipart_supported:
+            return self._send(404)
+        return self._multipart(path[len("api/v1/uploads/"):], query)
+
+    def _multipart(self, action, query):
+        if action == "create":
+            token = str(len(self.mock.uploads) + 1)
+            self.mock.uploads[token] = {"path": query["repoPath"][0].strip("/"),
+                                        "part_size": int(query["partSizeMB"][0]) * 1024 * 1024,
+                                        "sha1": self.headers["X-Checksum-Sha1"], "parts": {}, "state": "PARTS",
+                                        "polls": self.mock.multipart_processing_polls}
+            return self._send(200, {"token": token})
+        upload = self.mock.uploads.get(self.headers.get("X-JFrog-Upload-Token"))
+        if upload is None:
+            return self._send(401, {"errors": [{"status": 401, "message": "Invalid upload token"}]})
+        if action == "urlRequest":
+            part_url = (f"{self.mock.url}/api/v1/uploads/part?token={self.headers['X-JFrog-Upload-Token']}"
+                        f"&partNumber={query['partNumber'][0]}")
+            return self._send(200, {"url": part_url})
+        if action == "complete":
+            content = b"".join(c for _, c in sorted(upload["parts"].items()))
+            if any(len(c) != upload["part_size"] for _, c in sorted(upload["parts"].items())[:-1]):
+                upload.update(state="ABORTED", error="Invalid part size")
+            elif hashlib.sha1(content).hexdigest() != query["sha1"][0] or query["sha1"][0] != upload["sha1"]:
+                upload.update(state="ABORTED", error="Checksum mismatch")
+            else:
+                self.mock.put(upload["path"], content)
+                upload["state"] = "PROCESSING"
+            return self._send(202, headers={"X-Artifactory-Node-Id": "mock-node"})
+        if action == "status":
+            if self.headers.get("X-Artifactory-Node-Id") != "mock-node":
+                return self._send(400, {"errors": [{"status": 400, "message": "Unknown node"}]})
+            if upload["state"] == "PROCESSING":
+                if upload["polls"] > 0:
+                    upload["polls"] -= 1
+                    return self._send(200, {"status": "PROCESSING", "progress": 50})
+                upload["state"] = "FINISHED"
+            return self._send(200, {"status": upload["state"], **({"error": upload["error"]}
+                                                                   if "error" in upload else {})})
+        if action == "abort":
+            upload["state"] = "ABORTED"
+            return self._send(204)
+        return self._send(404)
+
+    def do_GET(self):
+        path, query = self._parse()
+        status = self._injected_failure(path)
+        if status:
+            return self._send(status, headers={"Retry-After": "0"})
+        if path.startswith("api/storage/"):
+            return self._storage(path[len("api/storage/"):], query)
+        if path == "api/signed/download":
+            if "Authorization" in self.headers:
+                return self._send(400, {"errors": [{"status": 400, "message": "Signed URL with credentials"}]})
+            repo_path, expires = self.mock.signed_urls.get(query["signature"][0], (None, 0))
+            if expires < time.time():
+                return self._send(401, {"errors": [{"status": 401, "message": "Invalid signature"}]})
+            path = repo_path
+        content = self.mock.files.get(path)
+        if content is None:
+            return self._send(404, {"errors": [{"status": 404, "message": "Not Found"}]})
+        headers = {"Content-Type": "application/octet-stream", "Accept-Ranges": "bytes"}
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header and range_header.startswith("bytes="):
+            start, _, end = range_header[len("bytes="):].partition("-")
+            start = int(start)
+            end = int(end) if end else len(content) - 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(content)}"
+            content = content[start:end + 1]
+            status = 206
+        if self._injected_reset(path):
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self._write(content[:len(content) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self._send(status, content, headers)
+
+    def do_DELETE(self):
+        path, _ = self._parse()
+        status = self._injected_failure(path)
+        if status:
+            return self._send(status)
+        if path.startswith("api/trash/clean/"):
+            self.mock.trash_cleaned.append(path[len("api/trash/clean/"):])
+            return self._send(204)
+        with self.mock.lock:
+            doomed = [p for p in self.mock.files if p == path or p.startswith(path + "/")]
+            for p in doomed:
+                del self.mock.files[p]
+        self._send(204 if doomed else 404)
+
+    def _storage(self, path, query):
+        uri = f"{self.mock.url}/api/storage/{path}"
+        if "list" in query and path in self.mock.listings:
+            return self._send(200, self.mock.listings[path], {"Content-Type": "application/json"})
+        content = self.mock.files.get(path)
+        if content is None and not self.mock.is_folder(path):
+            return self._send(404, {"errors": [{"status": 404, "message": "Unable to find item"}]})
+        if "list" in query:
+            if content is not None:
+                return self._send(400, {"errors": [{"status": 400, "message": "Expected a folder"}]})
+            return self._send(200, {"uri": uri, "files": self._list(path, query)})
+        if content is not None:
+            return self._send(200, {"uri": uri, "size": str(len(content)), "checksums": _checksums(content)})
+        children = [{"uri": "/" + name, "folder": folder} for name, folder in self.mock.children(path).items()]
+        return self._send(200, {"uri": uri, "children": children})
+
+    def _list(self, path, query):
+        deep = query.get("deep", ["0"])[0] == "1"
+        depth = int(query.get("depth", ["0"])[0] or 0) if not deep else 0
+        list_folders = query.get("listFolders", ["0"])[0] == "1"
+        prefix = path + "/" if path else ""
+        with self.mock.lock:
+            items = [(p[len(prefix):], c) for p, c in self.mock.files.items() if p.startswith(prefix)]
+        entries = {}
+        for rel, content in items:
+            parts = rel.split("/")
+            if not deep and depth:
+                parts = parts[:depth]
+                if len(parts) < len(rel.split("/")):
+                    if list_folders:
+                        entries["/" + "/".join(parts)] = {"uri": "/" + "/".join(parts), "size": -1, "folder": True}
+                    continue
+            elif list_folders:
+                for i in range(1, len(parts)):
+                    folder = "/" + "/".join(parts[:i])
+                    entries[folder] = {"uri": folder, "size": -1, "folder": True}
+            checksums = _checksums(content)
+            entries["/" + rel] = {"uri": "/" + rel, "size": len(content), "folder": False,
+                                  "sha1": checksums["sha1"], "sha2": checksums["sha256"]}
+        return list(entries.values())
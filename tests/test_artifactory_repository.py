@@ -0,0 +1,662 @@
+"""
+JFrogArtifactoryRepository tests against the in-process mock Artifactory, they do not require an Artifactory
+instance.
+"""
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from conftest import REPO, TIMING_CHECKS, create_repository
+
+
+def new_file_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def write_tree(root, files):
+    for rel_path, content in files.items():
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+
+
+def test_log_artifacts_uploads_tree(mock_artifactory, tmp_path):
+    files = {f"dir{i % 3}/file{i}.txt": os.urandom(i) for i in range(20)}
+    files["top.txt"] = b"top"
+    write_tree(tmp_path, files)
+
+    create_repository(mock_artifactory).log_artifacts(tmp_path, "run")
+
+    assert {path: mock_artifactory.files[f"{REPO}/run/{path}"] for path in files} == files
+
+
+def test_settings_are_read_once(mock_artifactory, monkeypatch):
+    from plugin.artifactory_repository import JFrogArtifactoryRepository
+    repository = create_repository(mock_artifactory)
+    monkeypatch.setenv("ARTIFACTORY_UPLOAD_WORKERS", "3")
+
+    other = JFrogArtifactoryRepository(mock_artifactory.artifactory_uri("other-repo"), tracking_uri="http://mlflow")
+
+    assert other.repository == "other-repo"
+    assert other.settings is repository.settings and other.settings.upload_workers == 8
+    assert other.retry is repository.retry and other.session is repository.session
+    assert create_repository(mock_artifactory).settings.upload_workers == 3
+
+
+def test_log_artifacts_reports_all_failures(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_UPLOAD_WORKERS", "1")
+    write_tree(tmp_path, {f"file{i}.txt": b"data" for i in range(5)})
+    mock_artifactory.inject_failure("PUT", f"{REPO}/run", status=403, times=2)
+
+    with pytest.raises(Exception, match="Failed uploading 2 of 5 artifacts"):
+        create_repository(mock_artifactory).log_artifacts(tmp_path, "run")
+    assert len([p for p in mock_artifactory.files if p.startswith(f"{REPO}/run/")]) == 3
+
+
+def test_upload_progress(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_UPLOAD_CHUNK_SIZE", "1000")
+    files = {"a.bin": os.urandom(2500), "dir/b.bin": os.urandom(1200)}
+    write_tree(tmp_path, files)
+    mock_artifactory.inject_failure("PUT", f"{REPO}/run/a.bin")
+    events = []
+
+    create_repository(mock_artifactory).log_artifacts(
+        tmp_path, "run", progress_callback=lambda path, file_progress, total: events.append((path, file_progress, total)))
+
+    assert {path: mock_artifactory.files[f"{REPO}/run/{path}"] for path in files} == files
+    last = {path: file_progress for path, file_progress, _ in events}
+    assert {path: (p.sent, p.size) for path, p in last.items()} == {"run/a.bin": (2500, 2500),
+                                                                    "run/dir/b.bin": (1200, 1200)}
+    # the retried upload restarts the progress of its file, not the total
+    assert (events[-1][2].sent, events[-1][2].size) == (3700, 3700)
+    assert max(total.sent for _, _, total in events) == 3700
+
+
+def test_metrics(mock_artifactory, tmp_path):
+    from plugin.metrics import metrics, start_metrics_server
+    metrics.reset()
+    content = os.urandom(3000)
+    write_tree(tmp_path, {"model.bin": content})
+    mock_artifactory.inject_failure("PUT", f"{REPO}/run/model.bin")
+    repository = create_repository(mock_artifactory)
+
+    repository.log_artifact(tmp_path / "model.bin", "run")
+    repository.download_artifacts("run/model.bin", str(tmp_path))
+
+    counters = metrics.snapshot()["counters"]
+    assert counters[("artifactory_requests_total", (("method", "PUT"), ("status", "503")))] == 1
+    assert counters[("artifactory_requests_total", (("method", "PUT"), ("status", "201")))] == 1
+    assert counters[("artifactory_retries_total", (("method", "PUT"), ("reason", "503")))] == 1
+    assert counters[("artifactory_operations_total", (("operation", "log_artifact"), ("outcome", "success")))] == 1
+    assert counters[("artifactory_bytes_sent_total", ())] == 2 * len(content)
+    assert counters[("artifactory_bytes_received_total", ())] == len(content)
+    server = start_metrics_server(0, "127.0.0.1")
+    exposition = requests.get(f"http://127.0.0.1:{server.server_address[1]}/metrics").text
+    assert 'artifactory_operation_duration_seconds_count{operation="download_artifacts"} 1' in exposition
+    assert 'artifactory_operations_in_flight{operation="log_artifact"} 0' in exposition
+
+
+def test_log_artifact_from_buffer(mock_artifactory):
+    content = os.urandom(5000)
+    repository = create_repository(mock_artifactory)
+
+    repository.log_artifact_from_buffer(content, "run/model.bin")
+    repository.log_artifact_from_buffer(io.BytesIO(b"{}"), "run/config.json")
+
+    assert mock_artifactory.files[f"{REPO}/run/model.bin"] == content
+    assert mock_artifactory.files[f"{REPO}/run/config.json"] == b"{}"
+
+
+def test_sync_artifacts(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_SYNC_INDEX", str(tmp_path / "index.json"))
+    local_dir = tmp_path / "checkpoint"
+    write_tree(local_dir, {"weights.bin": os.urandom(1000), "optimizer.bin": os.urandom(1000),
+                           "dir/config.json": b"{}", "dir/old.txt": b"old"})
+    hour_ago = time.time() - 3600
+    for root, _, names in os.walk(local_dir):
+        for name in names:
+            os.utime(os.path.join(root, name), (hour_ago, hour_ago))
+    repository = create_repository(mock_artifactory)
+    repository.log_artifacts(local_dir, "ckpt")
+
+    assert repository.sync_artifacts(local_dir, "ckpt")["uploaded"] == []
+    index = json.loads((tmp_path / "index.json").read_text())
+    assert sorted(os.path.basename(path) for path in index) == ["config.json", "old.txt", "optimizer.bin",
+                                                                  "weights.bin"]
+
+    write_tree(local_dir, {"weights.bin": os.urandom(1000), "dir/new.txt": b"new"})
+    os.remove(local_dir / "dir" / "old.txt")
+    puts = mock_artifactory.count("PUT")
+    result = repository.sync_artifacts(local_dir, "ckpt", delete=True)
+
+    assert sorted(result["uploaded"]) == ["ckpt/dir/new.txt", "ckpt/weights.bin"]
+    assert sorted(result["unchanged"]) == ["ckpt/dir/config.json", "ckpt/optimizer.bin"]
+    assert result["deleted"] == ["ckpt/dir/old.txt"]
+    assert mock_artifactory.count("PUT") - puts == 2
+    assert sorted(p for p in mock_artifactory.files if p.startswith(f"{REPO}/ckpt/")) == [
+        f"{REPO}/ckpt/dir/config.json", f"{REPO}/ckpt/dir/new.txt", f"{REPO}/ckpt/optimizer.bin",
+        f"{REPO}/ckpt/weights.bin"]
+
+
+def test_multipart_upload_retries_failed_parts(mock_artifactory, tmp_path, monkeypatch):
+    from plugin.multipart import MultipartUpload
+    monkeypatch.setattr(MultipartUpload, "status_interval", 0.01)
+    monkeypatch.setenv("ARTIFACTORY_MULTIPART_THRESHOLD", "1000")
+    monkeypatch.setenv("ARTIFACTORY_MULTIPART_PART_SIZE", str(1024 * 1024))
+    mock_artifactory.multipart_processing_polls = 2
+    content = os.urandom(2 * 1024 * 1024 + 1000)
+    write_tree(tmp_path, {"model.bin": content})
+    mock_artifactory.inject_failure("PUT", "api/v1/uploads/part", times=2)
+
+    create_repository(mock_artifactory).log_artifact(tmp_path / "model.bin", "model")
+
+    assert mock_artifactory.files[f"{REPO}/model/model.bin"] == content
+    assert mock_artifactory.count("PUT", "/api/v1/uploads/part") == 3 + 2
+    assert mock_artifactory.count("POST", "/api/v1/uploads/status") == 3
+
+
+def test_multipart_upload_falls_back_to_single_request(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_MULTIPART_THRESHOLD", "1000")
+    mock_artifactory.multipart_supported = False
+    content = os.urandom(2500)
+    write_tree(tmp_path, {"model.bin": content})
+
+    create_repository(mock_artifactory).log_artifact(tmp_path / "model.bin")
+
+    assert mock_artifactory.files[f"{REPO}/model.bin"] == content
+
+
+def test_checksum_deploy_skips_known_content(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_CHECKSUM_DEPLOY", "true")
+    monkeypatch.setenv("ARTIFACTORY_CHECKSUM_DEPLOY_MIN_SIZE", "100")
+    from plugin.metrics import metrics
+    metrics.reset()
+    write_tree(tmp_path, {"weights.bin": os.urandom(1000), "config.json": b"{}"})
+    repository = create_repository(mock_artifactory)
+
+    repository.log_artifacts(tmp_path, "run1")
+    repository.log_artifacts(tmp_path, "run2")
+
+    assert mock_artifactory.files[f"{REPO}/run2/weights.bin"] == mock_artifactory.files[f"{REPO}/run1/weights.bin"]
+    assert repository.checksum_deploy_stats == {"deployed_files": 1, "uploaded_files": 1, "bytes_saved": 1000}
+    counters = metrics.snapshot()["counters"]
+    assert counters[("artifactory_checksum_deploys_total", (("outcome", "deployed"),))] == 1
+    assert counters[("artifactory_checksum_deploys_total", (("outcome", "uploaded"),))] == 1
+    assert counters[("artifactory_checksum_deploy_bytes_saved_total", ())] == 1000
+
+
+def test_download_artifacts_directory(mock_artifactory, tmp_path):
+    files = {f"dir{i % 4}/file{i}": os.urandom(i * 10) for i in range(30)}
+    for rel_path, content in files.items():
+        mock_artifactory.put(f"{REPO}/run/{rel_path}", content)
+    repository = create_repository(mock_artifactory)
+
+    local_dir = repository.download_artifacts("run", str(tmp_path))
+
+    assert local_dir == os.path.join(tmp_path, "run")
+    for rel_path, content in files.items():
+        with open(os.path.join(local_dir, rel_path), "rb") as f:
+            assert f.read() == content
+        # downloads are written to temporary files, they must not keep their owner-only permissions
+        assert os.stat(os.path.join(local_dir, rel_path)).st_mode & 0o777 == new_file_mode()
+    # the item info telling it is a directory, then the listing of its tree
+    assert mock_artifactory.count("GET", "/api/storage") == 2
+
+
+def test_download_artifacts_file(mock_artifactory, tmp_path):
+    mock_artifactory.put(f"{REPO}/run/model.bin", b"model")
+
+    local_path = create_repository(mock_artifactory).download_artifacts("run/model.bin", str(tmp_path))
+
+    assert local_path == os.path.join(tmp_path, "run", "model.bin")
+    with open(local_path, "rb") as f:
+        assert f.read() == b"model"
+    # the item info, then the content
+    assert mock_artifactory.requests == [("GET", f"/api/storage/{REPO}/run/model.bin"),
+                                         ("GET", f"/{REPO}/run/model.bin")]
+
+
+def test_download_artifacts_pipelined_walk(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_LISTING", "walk")
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_QUEUE_SIZE", "2")
+    files = {f"d{i}/e{j}/file{k}.txt": os.urandom(10) for i in range(3) for j in range(3) for k in range(3)}
+    for rel_path, content in files.items():
+        mock_artifactory.put(f"{REPO}/run/{rel_path}", content)
+
+    local_dir = create_repository(mock_artifactory).download_artifacts("run", str(tmp_path))
+
+    for rel_path, content in files.items():
+        assert (tmp_path / "run" / rel_path).read_bytes() == content
+    gets = [path for method, path in mock_artifactory.requests if method == "GET"]
+    listings = [i for i, path in enumerate(gets) if path.startswith("/api/storage/")]
+    downloads = [i for i, path in enumerate(gets) if not path.startswith("/api/storage/")]
+    # the item info of the directory and one listing per folder, files are downloaded before the whole
+    # tree is listed
+    assert len(listings) == 1 + 1 + 3 + 9
+    assert downloads[0] < listings[-1]
+    assert local_dir == str(tmp_path / "run")
+
+
+def test_throttle(mock_artifactory, tmp_path, monkeypatch):
+    from plugin.metrics import metrics
+    metrics.reset()
+    monkeypatch.setenv("ARTIFACTORY_HOST_MAX_REQUESTS", "2")
+    monkeypatch.setenv("ARTIFACTORY_MAX_BYTES_PER_SECOND", "100000")
+    write_tree(tmp_path, {f"file{i}.bin": os.urandom(15000) for i in range(10)})
+    mock_artifactory.latency = 0.02
+    mock_artifactory.inject_failure("PUT", f"{REPO}/run/file0.bin", status=429)
+
+    start = time.monotonic()
+    create_repository(mock_artifactory).log_artifacts(tmp_path, "run")
+
+    if TIMING_CHECKS:
+        # 150KB at 100KB/s, the first second of transfer being a burst
+        assert time.monotonic() - start >= 0.45
+    assert mock_artifactory.max_in_flight <= 2
+    counters = metrics.snapshot()["counters"]
+    assert counters[("artifactory_throttled_seconds_total", (("reason", "bandwidth"),))] > 0
+    assert counters[("artifactory_throttled_seconds_total", (("reason", "requests"),))] > 0
+    assert counters[("artifactory_throttle_backoffs_total", ())] == 1
+
+    # downloads hold their slot until their streamed body is read
+    monkeypatch.setenv("ARTIFACTORY_HOST_MAX_REQUESTS", "1")
+    monkeypatch.setenv("ARTIFACTORY_MAX_BYTES_PER_SECOND", "0")
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_QUEUE_SIZE", "2")
+    for i in range(8):
+        mock_artifactory.put(f"{REPO}/downloads/file{i}.bin", os.urandom(20000))
+    mock_artifactory.latency = 0.0
+    mock_artifactory.bandwidth = 1000000
+    mock_artifactory.max_in_flight = 0
+    (tmp_path / "out").mkdir()
+
+    local_dir = create_repository(mock_artifactory).download_artifacts("downloads", str(tmp_path / "out"))
+
+    assert len(os.listdir(local_dir)) == 8
+    assert mock_artifactory.max_in_flight == 1
+
+
+def test_throttle_concurrent_directory_downloads(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_HOST_MAX_REQUESTS", "2")
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_QUEUE_SIZE", "2")
+    for i in range(40):
+        mock_artifactory.put(f"{REPO}/run{i % 2}/file{i}.bin", os.urandom(2000))
+    mock_artifactory.latency = 0.002
+    mock_artifactory.bandwidth = 1000000
+    repositories = [create_repository(mock_artifactory) for _ in range(2)]
+
+    local_dirs = []
+    # the listings of as many directories as the limit are read while their files are downloaded,
+    # the downloads are joined with a timeout so a deadlock fails the test
+    threads = [threading.Thread(target=lambda repository=repository, run=run: local_dirs.append(
+        repository.download_artifacts(run, str(tmp_path))), daemon=True)
+        for repository, run in zip(repositories, ["run0", "run1"])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert sum(len(os.listdir(local_dir)) for local_dir in local_dirs) == 40
+    assert mock_artifactory.max_in_flight <= 2
+
+
+def test_list_artifacts(mock_artifactory):
+    mock_artifactory.put(f"{REPO}/run/a.txt", b"a")
+    mock_artifactory.put(f"{REPO}/run/dir/b.txt", b"bb")
+    repository = create_repository(mock_artifactory)
+
+    listing = sorted((f.path, f.is_dir, f.file_size) for f in repository.list_artifacts("run"))
+
+    assert listing == [("run/a.txt", False, 1), ("run/dir", True, -1)]
+    assert repository.list_artifacts("run/a.txt") == []
+    assert repository.list_artifacts("missing") == []
+    assert mock_artifactory.count("GET") == 3
+
+
+def test_iter_artifacts(mock_artifactory):
+    from plugin.json_stream import iter_array
+    mock_artifactory.put(f"{REPO}/run/a.txt", b"a")
+    mock_artifactory.put(f"{REPO}/run/dir/b.txt", b"bb")
+    repository = create_repository(mock_artifactory)
+
+    entries = sorted(repository.iter_artifacts("run"))
+
+    assert entries == [("run/a.txt", False, 1), ("run/dir", True, -1)]
+    assert entries[0].to_file_info().path == "run/a.txt"
+    assert list(repository.iter_artifacts("missing")) == []
+    # entries split across chunks at every byte, including multi-byte characters and numbers
+    document = json.dumps({"uri": "x", "files": [{"uri": "/é", "size": 12345}, {"uri": "/b", "folder": True}],
+                           "created": 1}, ensure_ascii=False).encode()
+    chunks = [document[i:i + 1] for i in range(len(document))]
+    assert list(iter_array(chunks, "files")) == [{"uri": "/é", "size": 12345}, {"uri": "/b", "folder": True}]
+    assert list(iter_array([b'{"uri": "x"}'], "files")) == []
+
+
+def test_list_artifacts_cache(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_LIST_CACHE_TTL", "60")
+    monkeypatch.setenv("ARTIFACTORY_LIST_CACHE_SIZE", "2")
+    mock_artifactory.put(f"{REPO}/run/a.txt", b"a")
+    repository = create_repository(mock_artifactory)
+    repository.listing_cache.clear()
+    stats_before = repository.listing_cache.stats()
+    from plugin.metrics import metrics
+    metrics.reset()
+
+    assert [f.path for f in repository.list_artifacts("run")] == ["run/a.txt"]
+    assert [f.path for f in create_repository(mock_artifactory).list_artifacts("run")] == ["run/a.txt"]
+    assert mock_artifactory.count("GET") == 1
+
+    write_tree(tmp_path, {"b.txt": b"b"})
+    repository.log_artifact(tmp_path / "b.txt", "run")
+    assert sorted(f.path for f in repository.list_artifacts("run")) == ["run/a.txt", "run/b.txt"]
+    repository.delete_artifacts("run/a.txt")
+    assert [f.path for f in repository.list_artifacts("run")] == ["run/b.txt"]
+    repository.list_artifacts("other1")
+    repository.list_artifacts("other2")
+
+    stats = repository.listing_cache.stats()
+    assert stats["hits"] - stats_before["hits"] == 1
+    assert stats["misses"] - stats_before["misses"] == 5
+    assert stats["evictions"] - stats_before["evictions"] == 1
+    assert stats["size"] == 2
+    counters = metrics.snapshot()["counters"]
+    assert counters[("artifactory_listing_cache_lookups_total", (("result", "hit"),))] == 1
+    assert counters[("artifactory_listing_cache_lookups_total", (("result", "miss"),))] == 5
+    assert counters[("artifactory_listing_cache_evictions_total", ())] == 1
+
+    # a listing invalidated while it is read is not cached
+    iter_artifacts = repository.iter_artifacts
+
+    def iter_artifacts_while_logging(path=None):
+        for entry in iter_artifacts(path):
+            repository._invalidate_listings("run/c.txt")
+            yield entry
+
+    repository.iter_artifacts = iter_artifacts_while_logging
+    repository.list_artifacts("run")
+    del repository.iter_artifacts
+    get_count = mock_artifactory.count("GET")
+    repository.list_artifacts("run")
+    assert mock_artifactory.count("GET") == get_count + 1
+
+
+def test_download_cache(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_CACHE_MAX_SIZE", "3000")
+    files = {f"file{i}": os.urandom(1000) for i in range(3)}
+    for rel_path, content in files.items():
+        mock_artifactory.put(f"{REPO}/model/{rel_path}", content)
+    repository = create_repository(mock_artifactory)
+
+    for dst in ("first", "second"):
+        os.makedirs(tmp_path / dst)
+        local_dir = repository.download_artifacts("model", str(tmp_path / dst))
+        for rel_path, content in files.items():
+            with open(os.path.join(local_dir, rel_path), "rb") as f:
+                assert f.read() == content
+    assert mock_artifactory.count("GET", f"/{REPO}/model/") == 3
+    assert repository.download_cache.stats() == {"hits": 3, "misses": 3}
+
+    mock_artifactory.put(f"{REPO}/model/file3", os.urandom(1000))
+    repository.download_artifacts("model/file3", str(tmp_path / "second"))
+    cached = [f for _, _, filenames in os.walk(tmp_path / "cache" / "objects") for f in filenames]
+    assert len(cached) == 3
+
+
+def test_download_cache_shared_by_processes(tmp_path, monkeypatch):
+    import hashlib
+    import threading
+    from plugin import download_cache
+    content = os.urandom(1000)
+    sha256 = hashlib.sha256(content).hexdigest()
+    cache = download_cache.DownloadCache(tmp_path / "cache", 0)
+    place = download_cache.DownloadCache._place
+    evictions = []
+
+    def evicting_place(object_path, local_path):
+        # another process evicts the cache between the download of the object and its placement
+        evictor = threading.Thread(target=download_cache.DownloadCache(tmp_path / "cache", 0).evict)
+        evictor.start()
+        evictor.join(0.5)
+        evictions.append(evictor)
+        place(object_path, local_path)
+
+    def download(path):
+        with open(path, "wb") as f:
+            f.write(content)
+
+    monkeypatch.setattr(download_cache.DownloadCache, "_place", staticmethod(evicting_place))
+    cache.fetch(sha256, str(tmp_path / "first"), download)
+    for evictor in evictions:
+        evictor.join()
+    monkeypatch.setattr(download_cache.DownloadCache, "_place", staticmethod(place))
+    cache.max_size = 1000
+    cache.fetch(sha256, str(tmp_path / "second"), download)
+
+    # objects of another user of the cache cannot be touched
+    def utime(path):
+        raise PermissionError(13, "Permission denied", path)
+
+    monkeypatch.setattr(download_cache.os, "utime", utime)
+    cache.fetch(sha256, str(tmp_path / "third"), download)
+
+    for name in ("first", "second", "third"):
+        assert (tmp_path / name).read_bytes() == content
+    assert cache.stats() == {"hits": 1, "misses": 2}
+
+
+def test_retry_transient_failures(mock_artifactory, tmp_path):
+    write_tree(tmp_path, {"a.txt": b"a", "b.txt": b"b"})
+    repository = create_repository(mock_artifactory)
+    for method in ("PUT", "GET", "DELETE"):
+        mock_artifactory.inject_failure(method, REPO, status=503, times=2)
+    mock_artifactory.inject_failure("GET", "api/storage", status=502, times=2)
+
+    repository.log_artifacts(tmp_path, "run")
+    assert sorted(f.path for f in repository.list_artifacts("run")) == ["run/a.txt", "run/b.txt"]
+    repository.download_artifacts("run/a.txt", str(tmp_path))
+    repository.delete_artifacts("run")
+
+    assert mock_artifactory.files == {}
+    assert mock_artifactory.count("PUT") == 4
+    assert mock_artifactory.count("DELETE") == 3
+
+
+def test_download_resumes_interrupted_transfer(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_CHUNK_SIZE", "1000")
+    content = os.urandom(100000)
+    mock_artifactory.put(f"{REPO}/model.bin", content)
+    mock_artifactory.inject_reset(f"{REPO}/model.bin", times=2)
+
+    local_path = create_repository(mock_artifactory).download_artifacts("model.bin", str(tmp_path))
+
+    with open(local_path, "rb") as f:
+        assert f.read() == content
+    assert mock_artifactory.count("GET", f"/{REPO}/model.bin") == 3
+
+
+def test_signed_url_download(mock_artifactory, monkeypatch):
+    from mlflow.exceptions import MlflowException
+    from mlflow.store.artifact.artifact_repo import MultipartDownloadMixin
+    content = os.urandom(3000)
+    mock_artifactory.put(f"{REPO}/run/model.bin", content)
+    # MLflow advertises presigned downloads to clients for MultipartDownloadMixin repositories only
+    assert not isinstance(create_repository(mock_artifactory), MultipartDownloadMixin)
+
+    monkeypatch.setenv("ARTIFACTORY_SIGNED_URLS", "true")
+    repository = create_repository(mock_artifactory)
+    assert isinstance(repository, MultipartDownloadMixin)
+    presigned = repository.get_download_presigned_url("run/model.bin", expiration=60)
+    assert presigned.file_size == len(content)
+    assert requests.get(presigned.url, headers=presigned.headers).content == content
+
+    mock_artifactory.signed_urls_supported = False
+    with pytest.raises(MlflowException, match="not supported"):
+        repository.get_download_presigned_url("run/model.bin")
+
+
+def test_ranged_download(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_RANGED_DOWNLOAD_THRESHOLD", "10000")
+    monkeypatch.setenv("ARTIFACTORY_RANGED_DOWNLOAD_PART_SIZE", "3000")
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_CHUNK_SIZE", "500")
+    content = os.urandom(20000)
+    mock_artifactory.put(f"{REPO}/model/weights.bin", content)
+    mock_artifactory.put(f"{REPO}/model/config.json", b"{}")
+    mock_artifactory.inject_reset(f"{REPO}/model/weights.bin", times=1)
+
+    local_dir = create_repository(mock_artifactory).download_artifacts("model", str(tmp_path))
+
+    with open(os.path.join(local_dir, "weights.bin"), "rb") as f:
+        assert f.read() == content
+    assert mock_artifactory.count("GET", f"/{REPO}/model/weights.bin") == 7 + 1
+
+
+def test_ranged_downloads_share_workers(mock_artifactory, tmp_path, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_WORKERS", "4")
+    monkeypatch.setenv("ARTIFACTORY_RANGED_DOWNLOAD_WORKERS", "2")
+    monkeypatch.setenv("ARTIFACTORY_RANGED_DOWNLOAD_THRESHOLD", "10000")
+    monkeypatch.setenv("ARTIFACTORY_RANGED_DOWNLOAD_PART_SIZE", "3000")
+    files = {f"weights{i}.bin": os.urandom(20000) for i in range(4)}
+    for rel_path, content in files.items():
+        mock_artifactory.put(f"{REPO}/model/{rel_path}", content)
+    mock_artifactory.latency = 0.02
+
+    local_dir = create_repository(mock_artifactory).download_artifacts("model", str(tmp_path))
+
+    for rel_path, content in files.items():
+        with open(os.path.join(local_dir, rel_path), "rb") as f:
+            assert f.read() == content
+    # the segments of the 4 files downloaded concurrently are sent by the same 2 threads
+    assert mock_artifactory.max_in_flight == 2
+
+
+def test_delete_artifacts_bulk(mock_artifactory, monkeypatch):
+    monkeypatch.setenv("ARTIFACTORY_DELETE_SKIP_TRASH", "true")
+    for run in range(20):
+        mock_artifactory.put(f"{REPO}/1/run{run}/artifacts/model.pkl", b"model")
+    mock_artifactory.inject_failure("DELETE", f"{REPO}/1/run3", status=403)
+    progress = []
+
+    results = create_repository(mock_artifactory).delete_artifacts_bulk(
+        [f"1/run{run}" for run in range(20)] + ["1/missing"],
+        progress_callback=lambda completed, total, path, error: progress.append((completed, total)))
+
+    assert {path for path, error in results.items() if error is not None} == {"1/run3"}
+    assert list(mock_artifactory.files) == [f"{REPO}/1/run3/artifacts/model.pkl"]
+    assert sorted(progress) == [(i, 21) for i in range(1, 22)]
+    assert len(mock_artifactory.trash_cleaned) == 20
+
+
+@pytest.mark.parametrize("explode_supported", [True, False])
+def test_archive_upload(mock_artifactory, tmp_path, monkeypatch, explode_supported):
+    monkeypatch.setenv("ARTIFACTORY_ARCHIVE_UPLOAD", "true")
+    monkeypatch.setenv("ARTIFACTORY_ARCHIVE_UPLOAD_MIN_FILES", "10")
+    monkeypatch.setenv("ARTIFACTORY_ARCHIVE_UPLOAD_MAX_FILE_SIZE", "1000")
+    mock_artifactory.explode_supported = explode_supported
+    files = {f"vocab/part{i}.txt": os.urandom(i) for i in range(50)}
+    files["weights.bin"] = os.urandom(5000)
+    write_tree(tmp_path, files)
+
+    create_repository(mock_artifactory).log_artifacts(tmp_path, "model")
+
+    assert {path: mock_artifactory.files[f"{REPO}/model/{path}"] for path in files} == files
+    assert len(mock_artifactory.files) == len(files)
+    assert mock_artifactory.count("PUT") == (2 if explode_supported else 52)
+
+
+def test_async_transport(mock_artifactory, tmp_path, monkeypatch):
+    pytest.importorskip("aiohttp")
+    monkeypatch.setenv("ARTIFACTORY_ASYNC_TRANSPORT", "true")
+    files = {f"dir{i % 3}/file{i}": os.urandom(i * 100) for i in range(30)}
+    write_tree(tmp_path / "upload", files)
+    mock_artifactory.inject_failure("PUT", f"{REPO}/run/dir0", times=2)
+    mock_artifactory.inject_reset(f"{REPO}/run/dir1", times=2)
+    repository = create_repository(mock_artifactory)
+
+    repository.log_artifacts(tmp_path / "upload", "run")
+    os.makedirs(tmp_path / "download")
+    local_dir = repository.download_artifacts("run", str(tmp_path / "download"))
+
+    for rel_path, content in files.items():
+        assert mock_artifactory.files[f"{REPO}/run/{rel_path}"] == content
+        with open(os.path.join(local_dir, rel_path), "rb") as f:
+            assert f.read() == content
+        assert os.stat(os.path.join(local_dir, rel_path)).st_mode & 0o777 == new_file_mode()
+
+
+def test_async_transport_concurrency(mock_artifactory, tmp_path, monkeypatch):
+    pytest.importorskip("aiohttp")
+    import plugin.async_repository
+    monkeypatch.setenv("ARTIFACTORY_ASYNC_TRANSPORT", "true")
+    monkeypatch.setenv("ARTIFACTORY_ASYNC_MAX_CONCURRENCY", "3")
+    for i in range(40):
+        mock_artifactory.put(f"{REPO}/run{i % 2}/file{i}", os.urandom(1000))
+    mock_artifactory.latency = 0.01
+    temp_files = []
+    download_tempfile = plugin.async_repository.download_tempfile
+
+    def counting_download_tempfile(local_path):
+        temp_files.append(sum(name.endswith(".tmp") for _, _, names in os.walk(tmp_path) for name in names))
+        return download_tempfile(local_path)
+
+    monkeypatch.setattr(plugin.async_repository, "download_tempfile", counting_download_tempfile)
+
+    # a repository per download, as the tracking server creates one per request
+    repositories = [create_repository(mock_artifactory) for _ in range(2)]
+    with ThreadPoolExecutor(2) as executor:
+        local_dirs = list(executor.map(lambda repository, run: repository.download_artifacts(run, str(tmp_path)),
+                                       repositories, ["run0", "run1"]))
+
+    assert sum(len(os.listdir(local_dir)) for local_dir in local_dirs) == 40
+    assert mock_artifactory.max_in_flight <= 3
+    assert max(temp_files) < 3
+
+
+def test_async_transport_throttle(mock_artifactory, tmp_path, monkeypatch):
+    pytest.importorskip("aiohttp")
+    monkeypatch.setenv("ARTIFACTORY_ASYNC_TRANSPORT", "true")
+    monkeypatch.setenv("ARTIFACTORY_HOST_MAX_REQUESTS", "2")
+    write_tree(tmp_path / "upload", {f"file{i}.bin": os.urandom(2000) for i in range(20)})
+    mock_artifactory.latency = 0.005
+    mock_artifactory.bandwidth = 1000000
+    repository = create_repository(mock_artifactory)
+
+    repository.log_artifacts(tmp_path / "upload", "run")
+    os.makedirs(tmp_path / "download")
+    local_dir = repository.download_artifacts("run", str(tmp_path / "download"))
+
+    assert len(os.listdir(local_dir)) == 20
+    assert mock_artifactory.max_in_flight == 2
+
+
+def test_async_repository(mock_artifactory, tmp_path):
+    pytest.importorskip("aiohttp")
+    import asyncio
+    from plugin.artifactory_repository import clear_settings
+    from plugin.async_repository import AsyncJFrogArtifactoryRepository
+    clear_settings()
+    write_tree(tmp_path, {"a.txt": b"a", "dir/b.txt": b"bb"})
+    repository = AsyncJFrogArtifactoryRepository(mock_artifactory.artifactory_uri(REPO))
+
+    async def scenario():
+        async with repository:
+            await repository.log_artifacts(tmp_path, "run")
+            listing = sorted((f.path, f.is_dir) for f in await repository.list_artifacts("run"))
+            local_path = await repository.download_artifacts("run/dir/b.txt", str(tmp_path / "download"))
+            await repository.delete_artifacts("run")
+        return listing, local_path
+
+    listing, local_path = asyncio.run(scenario())
+
+    assert listing == [("run/a.txt", False), ("run/dir", True)]
+    with open(local_path, "rb") as f:
+        assert f.read() == b"bb"
+    assert mock_artifactory.files == {}
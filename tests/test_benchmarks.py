@@ -0,0 +1,310 @@
+"""
+Performance benchmarks of JFrogArtifactoryRepository against the in-process mock Artifactory.
+They do not require an Artifactory instance or network access, run with `pytest -s tests/test_benchmarks.py`
+to see the measured timings.
+
+Transfer benchmarks run with a simulated per-request latency and per-connection bandwidth, and fail when
+the requests of an operation are not handled concurrently by the mock, catching regressions which serialize
+them. Wall-clock checks are flaky on shared machines, with TIMING_CHECKS=false (as in CI) they are only reported.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pytest
+from conftest import REPO, TIMING_CHECKS, create_repository
+
+
+def report(name, durations, **details):
+    extra = " ".join(f"{key}={value}" for key, value in details.items())
+    print(f"\nBENCHMARK {name}: runs={len(durations)} median={statistics.median(durations) * 1000:.2f}ms "
+          f"min={min(durations) * 1000:.2f}ms max={max(durations) * 1000:.2f}ms {extra}")
+
+
+def check_timing(condition, description):
+    """Assert a wall-clock `condition`, or only report it when TIMING_CHECKS is false."""
+    if TIMING_CHECKS:
+        assert condition, description
+    elif not condition:
+        print(f"\nBENCHMARK timing check failed: {description}")
+
+
+def measure(func, runs):
+    durations = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+    return durations, result
+
+
+def test_plugin_import():
+    # modules of the transfers features are only imported once used
+    code = ("import sys, time; start = time.perf_counter(); import plugin.artifactory_repository; "
+            "print(time.perf_counter() - start); "
+            "print(','.join(m for m in ('plugin.archive', 'plugin.checksums', 'plugin.download_cache', "
+            "'plugin.hash_index', 'plugin.multipart', 'plugin.ranged_download') if m in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            check=True, capture_output=True, text=True).stdout.split("\n")
+
+    assert output[1] == ""
+    report("plugin_import", [float(output[0])])
+
+
+def test_repository_instantiation(mock_artifactory):
+    from plugin.artifactory_repository import JFrogArtifactoryRepository
+    create_repository(mock_artifactory)
+    instances = 10000
+
+    artifact_uris = [mock_artifactory.artifactory_uri(f"{REPO}/1/{i}/artifacts") for i in range(instances)]
+
+    def instantiate():
+        for artifact_uri in artifact_uris:
+            JFrogArtifactoryRepository(artifact_uri)
+
+    durations, _ = measure(instantiate, 1)
+
+    # MLflow creates a repository for every artifacts request of the tracking server
+    check_timing(durations[0] / instances < 0.001, "repository instantiation under 1ms")
+    report("repository_instantiation", durations, instances=instances,
+           per_instance_us=f"{durations[0] / instances * 1000000:.1f}")
+
+
+@pytest.mark.parametrize("children", [10, 1000, 100000])
+def test_list_artifacts_latency(mock_artifactory, children):
+    for i in range(children):
+        mock_artifactory.put(f"{REPO}/run/artifacts/file_{i}.txt", b"x")
+    repository = create_repository(mock_artifactory)
+    runs = 3 if children >= 100000 else 20
+
+    requests_before = mock_artifactory.count("GET")
+    durations, listing = measure(lambda: repository.list_artifacts("run/artifacts"), runs)
+
+    assert len(listing) == children
+    assert mock_artifactory.count("GET") - requests_before == runs
+    report("list_artifacts", durations, children=children)
+
+
+@pytest.mark.parametrize("api", ["list_artifacts", "iter_artifacts"])
+def test_list_artifacts_memory(mock_artifactory, api):
+    entries = 200000
+    mock_artifactory.listings[f"{REPO}/run/artifacts"] = json.dumps({
+        "uri": f"{mock_artifactory.url}/api/storage/{REPO}/run/artifacts",
+        "created": "2024-01-01T00:00:00.000Z",
+        "files": [{"uri": f"/file_{i}.bin", "size": i, "lastModified": "2024-01-01T00:00:00.000Z",
+                   "folder": False, "sha1": "0" * 40, "sha2": "0" * 64} for i in range(entries)],
+    }).encode()
+    repository = create_repository(mock_artifactory)
+    if api == "list_artifacts":
+        def count():
+            return len(repository.list_artifacts("run/artifacts"))
+    else:
+        def count():
+            return sum(1 for _ in repository.iter_artifacts("run/artifacts"))
+
+    tracemalloc.start()
+    try:
+        durations, listed = measure(count, 1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert listed == entries
+    if api == "iter_artifacts":
+        # the response is parsed as it is received, entries are not kept
+        assert peak < 4 * 1024 * 1024
+    report("list_artifacts_memory", durations, api=api, entries=entries, peak_mb=f"{peak / 1024 / 1024:.2f}",
+           entries_per_second=f"{entries / durations[0]:.0f}")
+
+
+@pytest.mark.parametrize("archive_upload", ["false", "true"])
+def test_log_artifacts_small_files(mock_artifactory, tmp_path, monkeypatch, archive_upload):
+    monkeypatch.setenv("ARTIFACTORY_ARCHIVE_UPLOAD", archive_upload)
+    files = 2000
+    for i in range(files):
+        path = tmp_path / f"dir{i % 20}" / f"file_{i}.json"
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"{}" * (i % 100))
+    mock_artifactory.latency = 0.002
+    repository = create_repository(mock_artifactory)
+
+    durations, _ = measure(lambda: repository.log_artifacts(tmp_path, "run"), 3)
+
+    assert len(mock_artifactory.files) == files
+    report("log_artifacts_small_files", durations, files=files, archive_upload=archive_upload,
+           requests=mock_artifactory.count("PUT") // 3)
+
+
+@pytest.mark.parametrize("size_mb", [16, 256])
+def test_log_artifact_memory(mock_artifactory, tmp_path, size_mb):
+    path = tmp_path / "model.bin"
+    with open(path, "wb") as f:
+        f.truncate(size_mb * 1024 * 1024)
+    mock_artifactory.discard_content = True
+    repository = create_repository(mock_artifactory)
+
+    tracemalloc.start()
+    try:
+        durations, _ = measure(lambda: repository.log_artifact(path, "run"), 1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # the memory used by an upload is bounded by ARTIFACTORY_UPLOAD_CHUNK_SIZE, whatever the file size
+    assert peak < 8 * 1024 * 1024
+    report("log_artifact_memory", durations, size_mb=size_mb, peak_mb=f"{peak / 1024 / 1024:.2f}")
+
+
+LATENCY = 0.005
+BANDWIDTH = 200 * 1024 * 1024
+TRANSFERS = [(200, 1024), (20, 1024 * 1024), (1, 64 * 1024 * 1024)]
+
+
+def write_files(root, files, size):
+    content = os.urandom(size)
+    for i in range(files):
+        path = root / f"dir{i % 10}" / f"file_{i}.bin"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+
+@pytest.mark.parametrize("limit", ["global", "host"])
+def test_bandwidth_limit(mock_artifactory, tmp_path, monkeypatch, limit):
+    rate = 4 * 1024 * 1024
+    monkeypatch.setenv("ARTIFACTORY_MAX_BYTES_PER_SECOND" if limit == "global" else
+                       "ARTIFACTORY_HOST_MAX_BYTES_PER_SECOND", str(rate))
+    files, size = 12, 1024 * 1024
+    write_files(tmp_path / "upload", files, size)
+    repository = create_repository(mock_artifactory)
+
+    upload, _ = measure(lambda: repository.log_artifacts(tmp_path / "upload", "run"), 1)
+    download, _ = measure(lambda: repository.download_artifacts("run", str(tmp_path)), 1)
+
+    # transfers get at most a one second burst above the limit
+    for duration in upload + download:
+        check_timing(duration >= (files * size - rate) / rate * 0.9, f"transfer limited to {rate} bytes per second")
+    report("bandwidth_limit", upload + download, limit=limit, limit_mbps=rate // 1024 // 1024,
+           upload_mbps=f"{files * size / upload[0] / 1024 / 1024:.2f}",
+           download_mbps=f"{files * size / download[0] / 1024 / 1024:.2f}")
+
+
+@pytest.mark.parametrize("files,size", TRANSFERS)
+def test_log_artifacts_throughput(mock_artifactory, tmp_path, files, size):
+    write_files(tmp_path, files, size)
+    mock_artifactory.latency = LATENCY
+    mock_artifactory.bandwidth = BANDWIDTH
+    repository = create_repository(mock_artifactory)
+
+    durations, _ = measure(lambda: repository.log_artifacts(tmp_path, "run"), 3)
+
+    assert mock_artifactory.count("PUT") == 3 * files
+    if files > 1:
+        assert mock_artifactory.max_in_flight > 1
+    report("log_artifacts", durations, files=files, size=size,
+           mb_per_second=f"{files * size / statistics.median(durations) / 1024 / 1024:.1f}")
+
+
+@pytest.mark.parametrize("files,size", TRANSFERS)
+def test_download_artifacts_throughput(mock_artifactory, tmp_path, files, size):
+    content = os.urandom(size)
+    for i in range(files):
+        mock_artifactory.put(f"{REPO}/run/dir{i % 10}/file_{i}.bin", content)
+    mock_artifactory.latency = LATENCY
+    mock_artifactory.bandwidth = BANDWIDTH
+    repository = create_repository(mock_artifactory)
+
+    def download():
+        dst_path = tmp_path / f"download_{time.perf_counter_ns()}"
+        dst_path.mkdir()
+        return repository.download_artifacts("run", str(dst_path))
+
+    durations, local_dir = measure(download, 3)
+
+    assert sum(len(names) for _, _, names in os.walk(local_dir)) == files
+    if files > 1:
+        assert mock_artifactory.max_in_flight > 1
+    report("download_artifacts", durations, files=files, size=size,
+           mb_per_second=f"{files * size / statistics.median(durations) / 1024 / 1024:.1f}")
+
+
+@pytest.mark.parametrize("ranged_download", ["false", "true"])
+def test_download_large_file(mock_artifactory, tmp_path, monkeypatch, ranged_download):
+    size = 64 * 1024 * 1024
+    monkeypatch.setenv("ARTIFACTORY_RANGED_DOWNLOAD_THRESHOLD", str(size if ranged_download == "true" else 0))
+    monkeypatch.setenv("ARTIFACTORY_RANGED_DOWNLOAD_PART_SIZE", str(8 * 1024 * 1024))
+    mock_artifactory.put(f"{REPO}/run/model.bin", os.urandom(size))
+    mock_artifactory.latency = LATENCY
+    mock_artifactory.bandwidth = 100 * 1024 * 1024
+    repository = create_repository(mock_artifactory)
+
+    durations, local_path = measure(lambda: repository.download_artifacts("run/model.bin", str(tmp_path)), 1)
+
+    assert os.path.getsize(local_path) == size
+    if ranged_download == "true":
+        assert mock_artifactory.max_in_flight > 1
+    report("download_large_file", durations, size=size, ranged_download=ranged_download,
+           mb_per_second=f"{size / statistics.median(durations) / 1024 / 1024:.1f}")
+
+
+@pytest.mark.parametrize("paths", [10, 200])
+def test_delete_artifacts_bulk(mock_artifactory, paths):
+    mock_artifactory.latency = LATENCY
+    repository = create_repository(mock_artifactory)
+
+    def delete():
+        for run in range(paths):
+            mock_artifactory.put(f"{REPO}/0/{run}/artifacts/model.bin", b"x")
+        start = time.perf_counter()
+        results = repository.delete_artifacts_bulk([f"0/{run}/artifacts" for run in range(paths)])
+        return time.perf_counter() - start, results
+
+    durations = []
+    for _ in range(3):
+        duration, results = delete()
+        durations.append(duration)
+        assert not any(results.values())
+
+    assert not mock_artifactory.files
+    assert mock_artifactory.max_in_flight > 1
+    report("delete_artifacts_bulk", durations, paths=paths)
+
+
+@pytest.mark.parametrize("files", [10, 1000])
+def test_delete_artifacts(mock_artifactory, files):
+    mock_artifactory.latency = LATENCY
+    repository = create_repository(mock_artifactory)
+
+    def delete():
+        for i in range(files):
+            mock_artifactory.put(f"{REPO}/0/run/artifacts/file_{i}.txt", b"x")
+        start = time.perf_counter()
+        repository.delete_artifacts("0/run")
+        return time.perf_counter() - start
+
+    durations = [delete() for _ in range(3)]
+
+    assert not mock_artifactory.files
+    assert mock_artifactory.count("DELETE") == 3
+    report("delete_artifacts", durations, files=files)
+
+
+@pytest.mark.parametrize("listing", ["deep", "walk"])
+def test_download_artifacts_large_tree(mock_artifactory, tmp_path, monkeypatch, listing):
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_LISTING", listing)
+    monkeypatch.setenv("ARTIFACTORY_DOWNLOAD_QUEUE_SIZE", "64")
+    files = 5000
+    for i in range(files):
+        mock_artifactory.put(f"{REPO}/run/shard{i % 50}/part{i // 500}/file_{i}.bin", b"x" * 100)
+    mock_artifactory.latency = 0.001
+    repository = create_repository(mock_artifactory)
+
+    durations, local_dir = measure(lambda: repository.download_artifacts("run", str(tmp_path)), 1)
+
+    assert sum(len(names) for _, _, names in os.walk(local_dir)) == files
+    report("download_artifacts_large_tree", durations, files=files, listing=listing,
+           listings=mock_artifactory.count("GET", "/api/storage/"))